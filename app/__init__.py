@@ -1,3 +1,11 @@
-from .api import app
-
 __all__ = ("app",)
+
+
+def __getattr__(name: str):
+    # The application is imported on first use, so the command line can run
+    # migrations and maintenance without loading the web stack.
+    if name == "app":
+        from .api import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,16 +1,39 @@
 import argparse
-from .models.db_task import Initialize
-from .cli import start
+from .const import HISTORY_RETENTION_DAYS
 
 args = argparse.ArgumentParser()
 action = args.add_subparsers(title="action", dest="action", required=True)
-action.add_parser("serve")
+serve = action.add_parser("serve")
+serve.add_argument("--prod", action="store_true", help="run without reload on several workers")
+serve.add_argument("--workers", type=int, help="worker processes with --prod")
 action.add_parser("migrate")
+action.add_parser("reindex")
+archive = action.add_parser("archive")
+archive.add_argument(
+    "--days", type=float, default=HISTORY_RETENTION_DAYS, help="archive History older than this"
+)
 parse = args.parse_args()
 
 
+# Each action imports only what it runs, so `migrate` on an up-to-date
+# database returns without loading Tortoise or the web application.
 if __name__ == "__main__":
     if parse.action == "serve":
-        start()
+        from .cli import start, start_production
+
+        if parse.prod:
+            start_production(parse.workers)
+        else:
+            start()
+    elif parse.action == "reindex":
+        from .models.db_task import Reindex
+
+        Reindex()
+    elif parse.action == "archive":
+        from .archive import Archive
+
+        Archive(parse.days)
     else:
-        Initialize()
+        from .models.migrations import Migrate
+
+        Migrate()
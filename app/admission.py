@@ -0,0 +1,243 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .const import (
+    ADMISSION_EXEMPT,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_READ_CONCURRENCY,
+    ADMISSION_READ_QUEUE,
+    ADMISSION_WRITE_CONCURRENCY,
+    ADMISSION_WRITE_QUEUE,
+)
+from .metrics import observe_admission, resolve_route
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class AdmissionGroupStatus(BaseModel):
+    concurrency: int
+    queue_size: int
+    active: int
+    waiting: int
+    admitted: int
+    queue_full: int
+    timed_out: int
+    service_time: float
+
+
+class AdmissionStatus(BaseModel):
+    queue_timeout: float
+    exempt: List[str]
+    groups: Dict[str, AdmissionGroupStatus]
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded FIFO queue of waiting requests.
+
+    At most `concurrency` requests run at once and at most `queue_size`
+    wait for a slot, each for up to `timeout` seconds. Anything beyond
+    that is rejected right away, so a burst costs the rejected clients
+    one round trip instead of a timeout for everyone.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self.admitted = 0
+        self.queue_full = 0
+        self.timed_out = 0
+        # Moving average of the time a request holds its slot.
+        self.service_time = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained, between 1 and 60."""
+        drain = (self.waiting + 1) * self.service_time / max(self.concurrency, 1)
+        return min(60, max(1, math.ceil(drain)))
+
+    def status(self) -> AdmissionGroupStatus:
+        return AdmissionGroupStatus(
+            concurrency=self.concurrency,
+            queue_size=self.queue_size,
+            active=self.active,
+            waiting=self.waiting,
+            admitted=self.admitted,
+            queue_full=self.queue_full,
+            timed_out=self.timed_out,
+            service_time=self.service_time,
+        )
+
+    async def acquire(self) -> None:
+        """Waits for a slot.
+
+        :raises Rejected: When the queue is full or the wait exceeds the timeout
+        """
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.queue_full += 1
+            raise Rejected("queue_full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                waiter.cancel()
+                self.timed_out += 1
+                raise Rejected("timeout", self.retry_after())
+            # The slot was handed over just as the wait expired.
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0, False)
+            else:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+            raise
+        self.admitted += 1
+
+    def release(self, service_time: float, observe: bool = True) -> None:
+        """Frees a slot, handing it directly to the oldest waiting request."""
+        if observe:
+            if self.service_time:
+                self.service_time += (service_time - self.service_time) * 0.1
+            else:
+                self.service_time = service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot changes hands without being counted free, so a
+                # newly arriving request cannot overtake the queue.
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControl:
+    """Admission gates of the read and write route groups.
+
+    A group with concurrency 0 is not limited. Paths starting with one of
+    `exempt` bypass the gates: streams that stay open for minutes, the
+    metrics and status endpoints that must answer during an overload, and
+    the playground, whose generated requests are admitted one by one.
+    """
+
+    def __init__(
+        self,
+        read_concurrency: int,
+        read_queue: int,
+        write_concurrency: int,
+        write_queue: int,
+        timeout: float,
+        exempt: Sequence[str],
+    ) -> None:
+        self.timeout = timeout
+        self.exempt = tuple(path for path in exempt if path)
+        self.gates: Dict[str, AdmissionGate] = {}
+        if read_concurrency > 0:
+            self.gates["read"] = AdmissionGate("read", read_concurrency, read_queue, timeout)
+        if write_concurrency > 0:
+            self.gates["write"] = AdmissionGate("write", write_concurrency, write_queue, timeout)
+
+    def status(self) -> AdmissionStatus:
+        return AdmissionStatus(
+            queue_timeout=self.timeout,
+            exempt=list(self.exempt),
+            groups={name: gate.status() for name, gate in self.gates.items()},
+        )
+
+    def gate(self, scope: Scope) -> Optional[AdmissionGate]:
+        if scope["path"].startswith(self.exempt):
+            return None
+        return self.gates.get("read" if scope["method"] in READ_METHODS else "write")
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that limits concurrent reads and writes separately.
+
+    Every write waits for the single SQLite writer, so admitting more of
+    them than it can serve only makes all of them slower. Requests over
+    the limit wait in a bounded queue; once it is full, or after waiting
+    `ADMISSION_QUEUE_TIMEOUT` seconds, they get a 503 with `Retry-After`.
+    The wait is recorded as the `queue` phase of the request, apart from
+    the time spent serving it.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        gate = admission.gate(scope) if scope["type"] == "http" else None
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await gate.acquire()
+        except Rejected as e:
+            observe_admission(gate.name, time.perf_counter() - started, e.reason)
+            resolve_route(scope)
+            await self.reject(send, gate.name, e)
+            return
+        admitted = time.perf_counter()
+        observe_admission(gate.name, admitted - started)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - admitted)
+
+    @staticmethod
+    async def reject(send: Send, group: str, rejected: Rejected) -> None:
+        body = json.dumps(
+            {
+                "success": False,
+                "message": f"Too many {group} requests ({rejected.reason}), "
+                f"retry in {rejected.retry_after}s",
+            }
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(rejected.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionControl(
+    read_concurrency=ADMISSION_READ_CONCURRENCY,
+    read_queue=ADMISSION_READ_QUEUE,
+    write_concurrency=ADMISSION_WRITE_CONCURRENCY,
+    write_queue=ADMISSION_WRITE_QUEUE,
+    timeout=ADMISSION_QUEUE_TIMEOUT,
+    exempt=ADMISSION_EXEMPT,
+)
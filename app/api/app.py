@@ -1,14 +1,54 @@
-from datetime import date
+import asyncio
+import contextlib
+from datetime import date, datetime, timedelta, timezone
 import os
-from typing import Annotated, List, Optional
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import RedirectResponse
+from typing import Annotated, Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, Form, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from tortoise.contrib.fastapi import register_tortoise
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
-from app.api.body import TasksActivityBody
+from app.api.body import (
+    PlaygroundBatchBody,
+    TasksActivityBody,
+    TasksActivityBulkBody,
+    TasksActivityCreateBody,
+    TasksActivityUpdateBody,
+)
+from app.api.bulk import bulk_create_tasks, bulk_delete_tasks, bulk_update_tasks
+from app.api.serialization import (
+    HISTORY_COLUMNS,
+    TASK_COLUMNS,
+    FastJSONResponse,
+    TimedJSONResponse,
+    fetch_page,
+    fetch_records,
+    loads,
+    select_columns,
+)
+from app.api.conditional import digest, is_not_modified, make_etag, not_modified, validators
+from app.api.export import MEDIA_TYPES, ExportFormat, encode_rows, iterate_chunks
+from app.api.ingest import IngestStatus, webhook_queue
+from app.api.playground import PlaygroundBatchStatus, webhook_dispatcher
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+    paginate,
+)
 from app.api.responses import (
+    BulkStatus,
     CreateTaskResponse,
+    DailyCount,
     DeleteStatus,
+    RecomputeStatus,
+    SearchHit,
+    SearchResponse,
+    StatsResponse,
+    TaskHistoryResponse,
+    TaskQueryResponse,
     TaskResponse,
     UpdateStatus,
     UpdateWebhookStatus,
@@ -24,11 +64,117 @@ from ..models.enum import (
     Status,
     SubCategoryName,
 )
+from ..models.database import WRITER, read_connection, tortoise_config
+from ..models.revision import read_history_revision, read_revision, read_task_revision
+from ..models.search import search_tasks
+from ..models.stats import (
+    read_daily_counters,
+    read_task_counters,
+    recompute_periodically,
+    recompute_stats,
+)
 from ..models.db_task import History, TasksActivity
-from ..const import HOST, PORT
-import httpx
+# Imported as a module: `app.archive` itself imports the api helpers and may
+# be loaded first by the command line.
+from .. import archive
+from ..admission import AdmissionMiddleware, AdmissionStatus, admission
+from ..cache import CacheStats, task_cache
+from ..changes import ChangeFeedStatus, change_feed
+from ..const import (
+    FAST_SERIALIZATION,
+    HISTORY_ARCHIVE_INTERVAL,
+    PLAYGROUND_BATCH_LIMIT,
+    SEARCH_MAX_LIMIT,
+    STATS_RECOMPUTE_INTERVAL,
+)
+from ..history import HistoryWriterStatus, history_writer
+from ..idempotency import IdempotencyMiddleware, IdempotencyStatus, idempotency_store
+from ..metrics import Gauge, MetricsMiddleware, registry
+
+app = FastAPI(title="TasksActivity API", default_response_class=TimedJSONResponse)
+# The middleware added last runs first: metrics wrap admission, so they
+# include the admission wait and the rejected requests, and replayed
+# retries are answered before they wait for a write slot.
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+CACHE_STATS = registry.register(
+    Gauge("task_cache_events", "Task cache counters, see /cache/stats", ("event",))
+)
+QUEUE_STATUS = registry.register(
+    Gauge("webhook_queue", "Webhook queue depth and counters, see /webhook/status", ("field",))
+)
+HISTORY_BUFFERED = registry.register(
+    Gauge("history_buffered_records", "History records waiting for the next flush")
+)
+CHANGE_FEED = registry.register(
+    Gauge("change_feed", "Change feed subscribers and counters, see /changes/status", ("field",))
+)
+IDEMPOTENCY = registry.register(
+    Gauge(
+        "idempotency", "Idempotency store size and counters, see /idempotency/status", ("field",)
+    )
+)
+ADMISSION = registry.register(
+    Gauge(
+        "admission",
+        "Admission gate slots, queue depth and counters, see /admission/status",
+        ("group", "field"),
+    )
+)
+
+
+@registry.collector
+def collect_service_status():
+    for event, value in task_cache.snapshot().model_dump().items():
+        CACHE_STATS.set((event,), value)
+    for field, value in webhook_queue.status().model_dump().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            QUEUE_STATUS.set((field,), value)
+    HISTORY_BUFFERED.set((), history_writer.status().buffered)
+    for field, value in change_feed.status().model_dump().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            CHANGE_FEED.set((field,), value)
+    for field, value in idempotency_store.status().model_dump().items():
+        IDEMPOTENCY.set((field,), value)
+    for group, status in admission.status().groups.items():
+        for field, value in status.model_dump().items():
+            ADMISSION.set((group, field), value)
+
+
+@app.on_event("startup")
+async def start_workers():
+    """Starts the background workers, periodic jobs and the playground client."""
+    await webhook_queue.start()
+    await history_writer.start()
+    await webhook_dispatcher.start(app)
+    await change_feed.start()
+    app.state.recompute = None
+    if STATS_RECOMPUTE_INTERVAL > 0:
+        app.state.recompute = asyncio.create_task(
+            recompute_periodically(STATS_RECOMPUTE_INTERVAL)
+        )
+    app.state.archive = None
+    if HISTORY_ARCHIVE_INTERVAL > 0:
+        app.state.archive = asyncio.create_task(
+            archive.archive_periodically(HISTORY_ARCHIVE_INTERVAL)
+        )
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    """Flushes pending webhook updates and History rows before the database is closed."""
+    await webhook_dispatcher.stop()
+    await change_feed.stop()
+    for task in (app.state.recompute, app.state.archive):
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    await webhook_queue.stop()
+    await history_writer.stop()
 
-app = FastAPI(title="TasksActivity API")
 
 @app.route("/")
 async def home(_: Request):
@@ -37,16 +183,133 @@ async def home(_: Request):
 
 
 @app.get("/task/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: int):
-    """Fetches a task by its ID and returns the task details."""
-    task = await TasksActivity.filter(task_id=task_id).first()
-    if task:
-        return TaskResponse(
-            success=True, message="Task Fetched Successfully", data=task.to_model()
+async def get_task(
+    request: Request, response: Response, task_id: int, fields: Optional[str] = None
+):
+    """Fetches a task by its ID and returns the task details.
+
+    Tasks are served through a read-through cache that every write path
+    invalidates. With `fields`, only the listed columns are selected and
+    the cache is bypassed. Responses carry `ETag` and `Last-Modified`, and
+    conditional requests for an unchanged task get 304 Not Modified.
+    """
+    if fields is not None:
+        columns = select_columns(TASK_COLUMNS, fields)
+        revision = await read_task_revision(read_connection(), task_id)
+        if revision is None:
+            return TaskResponse(success=False, message="Task Not Found")
+        version, modified = revision
+        headers = validators(
+            make_etag(task_id, version, digest(",".join(key for _, key in columns))), modified
         )
+        if is_not_modified(request, headers["ETag"], modified):
+            return not_modified(headers)
+        records = await fetch_records(TasksActivity.filter(task_id=task_id).limit(1), columns)
+        if records:
+            return FastJSONResponse(
+                {"success": True, "message": "Task Fetched Successfully", "data": records[0]},
+                headers=headers,
+            )
+        return TaskResponse(success=False, message="Task Not Found")
+    cached = await task_cache.get(task_id)
+    if cached:
+        headers = validators(make_etag(task_id, cached.version), cached.modified)
+        if is_not_modified(request, headers["ETag"], cached.modified):
+            return not_modified(headers)
+        response.headers.update(headers)
+        return TaskResponse(success=True, message="Task Fetched Successfully", data=cached.task)
     return TaskResponse(success=False, message="Task Not Found")
 
 
+@app.get("/task/{task_id}/history", response_model=TaskHistoryResponse)
+async def get_task_history(
+    task_id: int,
+    action: Optional[HistoryActionType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    from_end: Optional[bool] = True,
+    limit: Optional[int] = 50,
+    cursor: Optional[str] = None,
+    include_task: Optional[bool] = False,
+):
+    """Fetches the History timeline of one task, newest first by default.
+
+    Served by the `(task_id, time)` index of `History`. `action`, `since`
+    and `until` filter the records, and with `include_task` the current
+    task is returned along with them.
+    """
+    filters = {"task_id": task_id, "action": action, "time__gte": since, "time__lt": until}
+    queryset = paginate(
+        History.filter(**{key: value for key, value in filters.items() if value is not None}),
+        "id",
+        "time",
+        bool(from_end),
+        limit,
+        None,
+        cursor,
+    )
+    records, token = await fetch_page(
+        queryset, HISTORY_COLUMNS, "id", "time", bool(from_end), limit
+    )
+    task = None
+    if include_task:
+        cached = await task_cache.get(task_id)
+        task = cached.task.model_dump(mode="json") if cached else None
+    return FastJSONResponse({"task": task, "data": records, "next_cursor": token})
+
+
+async def insert_task(fields: Dict[str, Any], request: Request) -> CreateTaskResponse:
+    """Creates a task and its History record in one transaction.
+
+    :param fields: Validated task columns, by model field name
+    :param request: Request marked as failed if the task cannot be created,
+        so the failure is not replayed to an idempotent retry
+    :return: Status and the created task
+    :rtype: CreateTaskResponse
+    """
+    try:
+        async with history_writer.transaction() as connection:
+            task_activity = await TasksActivity.create(**fields, using_db=connection)
+            await history_writer.record(
+                task_activity.task_id,
+                HistoryActionType.CREATE,
+                f"Task {task_activity.task_id} was created by user",
+                connection,
+            )
+        return CreateTaskResponse(
+            success=True,
+            message="Record added successfully",
+            data=task_activity.to_model(),
+        )
+    except Exception as e:
+        request.state.failed = True
+        return CreateTaskResponse(
+            success=False, message=" ".join(i.__str__() for i in e.args)
+        )
+
+
+async def replace_task(task_id: int, fields: Dict[str, Any]) -> UpdateStatus:
+    """Overwrites the columns of a task and records the update.
+
+    :param task_id: Task to update
+    :param fields: Validated task columns, by model field name
+    :return: Whether the task existed
+    :rtype: UpdateStatus
+    """
+    async with history_writer.transaction() as connection:
+        updated = await TasksActivity.filter(task_id=task_id).using_db(connection).update(**fields)
+        if updated:
+            await history_writer.record(
+                task_id, HistoryActionType.UPDATE, f"Task {task_id} was updated", connection
+            )
+    if updated:
+        await task_cache.invalidate(task_id)
+    return UpdateStatus(
+        success=bool(updated),
+        message="Task Updated Succesfully" if updated else "Task Not Found",
+    )
+
+
 @app.post("/tasks-activity", response_model=CreateTaskResponse)
 async def create_task_activity(
     task_name: Annotated[str, Form()],
@@ -80,10 +343,11 @@ async def create_task_activity(
     link_response_id: Annotated[int, Form()],
     link_object_id: Annotated[int, Form()],
     created_by: Annotated[str, Form()],
+    request: Request,
 ):
     """Creates a new task activity and records it in the database."""
-    try:
-        task_activity = await TasksActivity.create(
+    return await insert_task(
+        dict(
             task_name=task_name,
             task_description=task_description,
             activity_type_id=activity_type_id,
@@ -115,38 +379,193 @@ async def create_task_activity(
             link_response_id=link_response_id,
             link_object_id=link_object_id,
             created_by=created_by,
-        )
-        await History.create(
-            task_id=task_activity.task_id,
-            action=HistoryActionType.CREATE,
-            description=f"Task {task_activity.task_id} was created by user",
-        )
-        return CreateTaskResponse(
-            success=True,
-            message="Record added successfully",
-            data=task_activity.to_model(),
-        )
-    except Exception as e:
-        return CreateTaskResponse(
-            success=False, message=" ".join(i.__str__() for i in e.args)
-        )
+        ),
+        request,
+    )
+
+
+@app.post("/tasks-activity/json", response_model=CreateTaskResponse)
+async def create_task_activity_json(body: TasksActivityCreateBody, request: Request):
+    """Creates a new task activity from a JSON body.
+
+    Same as `POST /tasks-activity`, without the multipart form parsing.
+    """
+    return await insert_task(body.model_dump(), request)
+
+
+@app.post("/tasks-activity/bulk", response_model=BulkStatus)
+async def bulk_task_activity(body: TasksActivityBulkBody):
+    """Creates, updates and deletes task activities in chunked transactions.
+
+    Creates run first, then partial updates (same shape as the webhook
+    payload), then deletes. Every item gets its own entry in `results`.
+    """
+    results = (
+        await bulk_create_tasks(body.create)
+        + await bulk_update_tasks(body.update)
+        + await bulk_delete_tasks(body.delete)
+    )
+    failed = sum(not result.success for result in results)
+    return BulkStatus(
+        success=not failed,
+        message=f"{len(results) - failed} of {len(results)} operations succeeded",
+        results=results,
+    )
 
 
 @app.get("/task-activity", response_model=List[TasksActivityModel])
 async def read_task_activity(
+    request: Request,
+    response: Response,
     from_end: Optional[bool] = False,
     limit: Optional[int] = None,
     offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order_by: Literal["task_id", "created_on"] = "task_id",
+    fields: Optional[str] = None,
+):
+    """Fetches a list of task activities from the database.
+
+    When `limit` is given and more rows may follow, the cursor of the next
+    page is returned in the `X-Next-Cursor` header. `fields` takes a
+    comma-separated list of keys and selects only those columns.
+
+    The `ETag` changes with every write to the table, so conditional
+    requests are answered with 304 Not Modified before the page is read.
+    """
+    revision = await read_revision(read_connection())
+    version, modified = revision or (0, None)
+    headers = validators(make_etag("tasks", version, digest(request.url.query)), modified)
+    if is_not_modified(request, headers["ETag"], modified):
+        return not_modified(headers)
+    queryset = paginate(
+        TasksActivity.all(), "task_id", order_by, bool(from_end), limit, offset, cursor
+    )
+    if fields is not None or FAST_SERIALIZATION:
+        records, token = await fetch_page(
+            queryset,
+            select_columns(TASK_COLUMNS, fields),
+            "task_id",
+            order_by,
+            bool(from_end),
+            limit,
+        )
+        if token:
+            headers[NEXT_CURSOR_HEADER] = token
+        return FastJSONResponse(records, headers=headers)
+    tasks = await queryset
+    token = next_cursor(tasks, "task_id", order_by, bool(from_end), limit)
+    if token:
+        headers[NEXT_CURSOR_HEADER] = token
+    response.headers.update(headers)
+    return [task.to_model() for task in tasks]
+
+
+@app.get("/task-activity/query", response_model=TaskQueryResponse)
+async def query_task_activity(
+    status: Optional[Status] = None,
+    stage_name: Optional[StageName] = None,
+    activity_type_name: Optional[ActivityName] = None,
+    assign_to_email: Optional[str] = None,
+    core_group_id: Optional[int] = None,
+    due_from: Optional[date] = None,
+    due_to: Optional[date] = None,
+    order_by: Literal["task_id", "due_date", "created_on"] = "task_id",
+    from_end: Optional[bool] = False,
+    limit: Optional[int] = 100,
+    cursor: Optional[str] = None,
+    explain: Optional[bool] = False,
 ):
-    """Fetches a list of task activities from the database."""
-    awaitable = TasksActivity.all()
-    if from_end:
-        awaitable = awaitable.order_by("-task_id")
-    if isinstance(offset, int):
-        awaitable = awaitable.offset(offset)
-    if not (limit is None):
-        awaitable = awaitable.limit(limit)
-    return [history.to_model() for history in await awaitable]
+    """Fetches task activities matching the given filters.
+
+    Filters are combined with AND and served by the composite indexes of
+    `TasksActivity`. With `explain=true` the SQLite query plan is returned
+    in `plan`, showing which index the query used.
+    """
+    filters = {
+        "status": status,
+        "stage_name": stage_name,
+        "activity_type_name": activity_type_name,
+        "assign_to_email": assign_to_email,
+        "core_group_id": core_group_id,
+        "due_date__gte": due_from,
+        "due_date__lte": due_to,
+    }
+    queryset = paginate(
+        TasksActivity.filter(**{key: value for key, value in filters.items() if value is not None}),
+        "task_id",
+        order_by,
+        bool(from_end),
+        limit,
+        None,
+        cursor,
+    )
+    tasks = await queryset
+    plan = None
+    if explain:
+        plan = [row["detail"] for row in await queryset.explain()]
+    return TaskQueryResponse(
+        data=[task.to_model() for task in tasks],
+        next_cursor=next_cursor(tasks, "task_id", order_by, bool(from_end), limit),
+        plan=plan,
+    )
+
+
+@app.get("/search", response_model=SearchResponse)
+async def search_task_activity(
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=SEARCH_MAX_LIMIT)] = 20,
+    cursor: Optional[str] = None,
+):
+    """Searches task names, descriptions and notes.
+
+    Every word of `q` must match; a trailing `*` matches a prefix. Hits are
+    ranked by relevance and come with a highlighted snippet.
+    """
+    after = None
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if position.order != "rank":
+            raise HTTPException(status_code=400, detail="Cursor does not match the search")
+        after = (position.value, position.pk)
+    hits = await search_tasks(read_connection(), q, limit, after)
+    tasks = {
+        task.task_id: task
+        for task in await TasksActivity.filter(task_id__in=[hit["task_id"] for hit in hits])
+    }
+    data = [
+        SearchHit(rank=hit["rank"], snippet=hit["snippet"], data=tasks[hit["task_id"]].to_model())
+        for hit in hits
+        if hit["task_id"] in tasks
+    ]
+    token = None
+    if hits and len(hits) == limit:
+        token = encode_cursor("rank", False, hits[-1]["rank"], hits[-1]["task_id"])
+    return SearchResponse(data=data, next_cursor=token)
+
+
+@app.get("/task-activity/export")
+async def export_task_activity(
+    format: ExportFormat = "ndjson",
+    from_end: Optional[bool] = False,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order_by: Literal["task_id", "created_on"] = "task_id",
+):
+    """Streams task activities as NDJSON or CSV.
+
+    Accepts the same ordering and pagination parameters as `/task-activity`
+    and reads the table in fixed-size chunks while the response is sent.
+    """
+    chunks = iterate_chunks(
+        TasksActivity.all(), "task_id", order_by, bool(from_end), limit, offset, cursor
+    )
+    return StreamingResponse(
+        encode_rows(chunks, TasksActivityModel, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=tasks-activity.{format}"},
+    )
 
 
 @app.put("/task-activity")
@@ -185,86 +604,245 @@ async def update_task_activity(
     created_by: Annotated[str, Form()],
 ):
     """Updates an existing task activity in the database."""
-    updated = await TasksActivity.filter(task_id=task_id).update(
-        task_name=task_name,
-        task_description=task_description,
-        activity_type_id=activity_type_id,
-        activity_type_name=activity_type_name,
-        activity_group_sub_category_id=activity_group_sub_category_id,
-        activity_group_sub_category_name=activity_group_sub_category_name,
-        activity_group_id=activity_group_id,
-        activity_group_name=activity_group_name,
-        stage_id=stage_id,
-        stage_name=stage_name,
-        core_group_category_id=core_group_category_id,
-        core_group_category=core_group_category,
-        core_group_id=core_group_id,
-        core_group_name=core_group_name,
-        due_date=due_date,
-        action_type=action_type,
-        related_to=related_to,
-        related_to_picture_id=related_to_picture_id,
-        related_to_email=related_to_email,
-        related_to_company=related_to_company,
-        assign_to=assign_to,
-        assign_to_email=assign_to_email,
-        assign_to_picture_id=assign_to_picture_id,
-        assign_to_company=assign_to_company,
-        notes=notes,
-        status=status,
-        attachment_id=attachment_id,
-        attachments=attachments,
-        link_response_id=link_response_id,
-        link_object_id=link_object_id,
-        created_by=created_by,
-    )
-    if updated:
-        await History.create(
-            task_id=task_id,
-            action=HistoryActionType.UPDATE,
-            description=f"Task {task_id} was updated",
-        )
-    return UpdateStatus(
-        success=bool(updated),
-        message="Task Updated Succesfully" if updated else "Task Not Found",
+    return await replace_task(
+        task_id,
+        dict(
+            task_name=task_name,
+            task_description=task_description,
+            activity_type_id=activity_type_id,
+            activity_type_name=activity_type_name,
+            activity_group_sub_category_id=activity_group_sub_category_id,
+            activity_group_sub_category_name=activity_group_sub_category_name,
+            activity_group_id=activity_group_id,
+            activity_group_name=activity_group_name,
+            stage_id=stage_id,
+            stage_name=stage_name,
+            core_group_category_id=core_group_category_id,
+            core_group_category=core_group_category,
+            core_group_id=core_group_id,
+            core_group_name=core_group_name,
+            due_date=due_date,
+            action_type=action_type,
+            related_to=related_to,
+            related_to_picture_id=related_to_picture_id,
+            related_to_email=related_to_email,
+            related_to_company=related_to_company,
+            assign_to=assign_to,
+            assign_to_email=assign_to_email,
+            assign_to_picture_id=assign_to_picture_id,
+            assign_to_company=assign_to_company,
+            notes=notes,
+            status=status,
+            attachment_id=attachment_id,
+            attachments=attachments,
+            link_response_id=link_response_id,
+            link_object_id=link_object_id,
+            created_by=created_by,
+        ),
     )
 
 
+@app.put("/task-activity/json", response_model=UpdateStatus)
+async def update_task_activity_json(body: TasksActivityUpdateBody):
+    """Updates an existing task activity from a JSON body.
+
+    Same as `PUT /task-activity`, without the multipart form parsing.
+    """
+    return await replace_task(body.task_id, body.model_dump(exclude={"task_id"}))
+
+
 @app.delete("/task-activity")
 async def delete_task_activity(task_id: Annotated[int, Form()]):
     """Deletes a task activity from the database."""
-    deleted = await TasksActivity.filter(task_id=task_id).delete()
+    async with history_writer.transaction() as connection:
+        deleted = await TasksActivity.filter(task_id=task_id).using_db(connection).delete()
+        if deleted:
+            await history_writer.record(
+                task_id,
+                HistoryActionType.DELETE,
+                f"Task {task_id} was deleted by user",
+                connection,
+            )
     if deleted:
-        await History.create(
-            task_id=task_id,
-            action=HistoryActionType.DELETE,
-            description=f"Task {task_id} was deleted by user",
-        )
+        await task_cache.invalidate(task_id)
     return DeleteStatus(
         success=bool(deleted),
         message="Task deleted succesfully" if deleted else "Task Not Found",
     )
 
 
+def filter_histories(
+    task_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    include_archived: Optional[bool],
+    order_by: str,
+    offset: Optional[int],
+) -> QuerySet[History]:
+    """Applies the filters shared by `/histories` and `/histories/export`.
+
+    :raises HTTPException: 400 if `include_archived` is combined with
+        another ordering than id or with an offset
+    :return: History rows of the table matching the filters
+    :rtype: QuerySet[History]
+    """
+    if include_archived and (order_by != "id" or offset):
+        raise HTTPException(
+            status_code=400,
+            detail="include_archived only supports order_by=id without offset",
+        )
+    filters = {"task_id": task_id, "time__gte": since, "time__lt": until}
+    return History.filter(**{key: value for key, value in filters.items() if value is not None})
+
+
 @app.get("/histories", response_model=List[HistoryModel])
 async def histories(
+    request: Request,
+    response: Response,
+    from_end: Optional[bool] = False,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order_by: Literal["id", "time"] = "id",
+    fields: Optional[str] = None,
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: Optional[bool] = False,
+):
+    """Fetches a list of history records from the database.
+
+    When `limit` is given and more rows may follow, the cursor of the next
+    page is returned in the `X-Next-Cursor` header. `fields` takes a
+    comma-separated list of keys and selects only those columns.
+    `task_id`, `since` and `until` filter the records, and with
+    `include_archived` records moved to the archive are returned as well,
+    ordered by id.
+
+    The `ETag` is derived from the first and last History ids, so
+    conditional requests are answered with 304 Not Modified before the
+    page is read.
+    """
+    revision = await read_history_revision(read_connection())
+    first, last, modified = revision or (0, 0, None)
+    headers = validators(make_etag("histories", first, last, digest(request.url.query)), modified)
+    if is_not_modified(request, headers["ETag"], modified):
+        return not_modified(headers)
+    filtered = filter_histories(task_id, since, until, include_archived, order_by, offset)
+    if include_archived:
+        records, token = await archive.fetch_history_page(
+            filtered,
+            select_columns(HISTORY_COLUMNS, fields),
+            first if revision else None,
+            bool(from_end),
+            limit,
+            cursor,
+            task_id,
+            since,
+            until,
+        )
+        if token:
+            headers[NEXT_CURSOR_HEADER] = token
+        return FastJSONResponse(records, headers=headers)
+    queryset = paginate(filtered, "id", order_by, bool(from_end), limit, offset, cursor)
+    if fields is not None or FAST_SERIALIZATION:
+        records, token = await fetch_page(
+            queryset,
+            select_columns(HISTORY_COLUMNS, fields),
+            "id",
+            order_by,
+            bool(from_end),
+            limit,
+        )
+        if token:
+            headers[NEXT_CURSOR_HEADER] = token
+        return FastJSONResponse(records, headers=headers)
+    histories = await queryset
+    token = next_cursor(histories, "id", order_by, bool(from_end), limit)
+    if token:
+        headers[NEXT_CURSOR_HEADER] = token
+    response.headers.update(headers)
+    return [history.to_model() for history in histories]
+
+
+@app.get("/changes")
+async def changes(
+    request: Request,
+    task_id: Optional[int] = None,
+    core_group_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+):
+    """Streams task changes as Server-Sent Events.
+
+    Every create, update, delete and webhook change is sent as an event
+    named after its action, with the History row and the task's current
+    `core_group_id` as data and the History id as event id. Clients resume
+    after the id in `Last-Event-ID`, or `last_id` on the first connection.
+    A client too slow to keep up receives an `evicted` event and should
+    reconnect.
+    """
+    header = request.headers.get("last-event-id")
+    if header is not None:
+        try:
+            last_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a History id")
+    return StreamingResponse(
+        change_feed.stream(task_id, core_group_id, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/changes/status", response_model=ChangeFeedStatus)
+async def changes_status():
+    """Returns subscribers, tail position and eviction counters of the change feed."""
+    return change_feed.status()
+
+
+@app.get("/histories/export")
+async def export_histories(
+    format: ExportFormat = "ndjson",
     from_end: Optional[bool] = False,
     limit: Optional[int] = None,
     offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+    order_by: Literal["id", "time"] = "id",
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: Optional[bool] = False,
 ):
-    """Fetches a list of history records from the database."""
-    awaitable = History.all()
-    if from_end:
-        awaitable = awaitable.order_by("-id")
-    if isinstance(offset, int):
-        awaitable = awaitable.offset(offset)
-    if not (limit is None):
-        awaitable = awaitable.limit(limit)
-    return [history.to_model() for history in await awaitable]
+    """Streams history records as NDJSON or CSV.
+
+    Accepts the same ordering, pagination and filter parameters as
+    `/histories` and reads the table, and with `include_archived` the
+    archive, in fixed-size chunks while the response is sent.
+    """
+    filtered = filter_histories(task_id, since, until, include_archived, order_by, offset)
+    if include_archived:
+        revision = await read_history_revision(read_connection())
+        chunks = await archive.iterate_history_pages(
+            filtered,
+            revision[0] if revision else None,
+            bool(from_end),
+            limit,
+            cursor,
+            task_id,
+            since,
+            until,
+        )
+    else:
+        chunks = iterate_chunks(filtered, "id", order_by, bool(from_end), limit, offset, cursor)
+    return StreamingResponse(
+        encode_rows(chunks, HistoryModel, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=histories.{format}"},
+    )
 
 
 @app.post("/webhook", response_model=UpdateWebhookStatus)
-async def update_task_activity_webhook(request: Request):
+async def update_task_activity_webhook(request: Request, response: Response):
     """Handle incoming webhook data to update a task activity.
 
     This function processes a JSON payload received via a POST request.
@@ -272,10 +850,16 @@ async def update_task_activity_webhook(request: Request):
     If the payload includes fields that do not correspond to `TaskActivity`, 
     they will be ignored. The function ensures data type validation, 
     and returns an error if the data types are incorrect.
+
+    With `WEBHOOK_MODE=queue` the validated update is queued and applied by
+    background workers, and the request returns 202 Accepted right away.
     """    
     try:
-        payload = await request.json()
-        task_id = payload.get("task_id")
+        # The idempotency middleware usually decoded the body already.
+        payload = getattr(request.state, "payload", None)
+        if payload is None:
+            payload = loads(await request.body())
+        task_id = payload.get("task_id") if isinstance(payload, dict) else None
         if isinstance(task_id, int):
             task_activity_keys = set(TasksActivityBody.model_fields.keys())
             intersection = set(payload) & task_activity_keys
@@ -285,41 +869,140 @@ async def update_task_activity_webhook(request: Request):
                 | {i: None for i in key_with_default_value}
             )
             payload_kwargs = update_data.model_dump(exclude={"task_id"}, exclude_none=True)
-            status = await TasksActivity.filter(task_id=task_id).update(
-                **payload_kwargs
-            )
+            if webhook_queue.enabled:
+                if not webhook_queue.submit(task_id, payload_kwargs):
+                    response.status_code = 503
+                    return UpdateWebhookStatus(
+                        success=False, message="Webhook queue is full"
+                    )
+                response.status_code = 202
+                return UpdateWebhookStatus(success=True, message="task update queued")
+            async with history_writer.transaction() as connection:
+                status = await TasksActivity.filter(task_id=task_id).using_db(
+                    connection
+                ).update(**payload_kwargs)
+                if status:
+                    await history_writer.record(
+                        task_id,
+                        HistoryActionType.UPDATE,
+                        f"Task {task_id} was updated: {', '.join(payload_kwargs)} were modified.",
+                        connection,
+                    )
             if status:
-                await History.create(
-                    task_id=task_id,
-                    action=HistoryActionType.UPDATE,
-                    description=f"Task {task_id} was updated: {', '.join(payload_kwargs)} were modified.",
-                )
+                await task_cache.invalidate(task_id, "webhook")
+            else:
+                request.state.failed = True
             return UpdateWebhookStatus(
                 success=bool(status),
                 message="task updated successfully" if status else "Task Not Found",
             )
+        request.state.failed = True
         return UpdateWebhookStatus(success=False, message="Task Not Found")
     except Exception as e:
+        # Failures are not replayed to an idempotent retry.
+        request.state.failed = True
         return UpdateWebhookStatus(
             success=False,
             message=f"{e.__class__}:" + f" ".join(i.__str__() for i in e.args),
         )
 
 
+@app.get("/stats", response_model=StatsResponse)
+async def stats(days: int = 30):
+    """Returns task counts by status, stage, activity group and core group category.
+
+    Counts are read from counters maintained on every write, so the cost
+    depends on the number of groups rather than the number of tasks.
+    `daily` holds the History actions of the last `days` days.
+    """
+    connection = read_connection()
+    counters = await read_task_counters(connection)
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    daily: Dict[str, DailyCount] = {}
+    for day, action, count in await read_daily_counters(connection, since.isoformat()):
+        setattr(daily.setdefault(day, DailyCount(day=date.fromisoformat(day))), action, count)
+    return StatsResponse(
+        total=counters.get("total", {}).get("", 0),
+        status=counters.get("status", {}),
+        stage_name=counters.get("stage_name", {}),
+        activity_group_name=counters.get("activity_group_name", {}),
+        core_group_category=counters.get("core_group_category", {}),
+        daily=list(daily.values()),
+    )
+
+
+@app.post("/stats/recompute", response_model=RecomputeStatus)
+async def stats_recompute():
+    """Recounts the stats counters from the tables to correct any drift."""
+    async with in_transaction(WRITER) as connection:
+        drift = await recompute_stats(connection)
+    return RecomputeStatus(success=True, message="Stats recomputed", drift=drift)
+
+
+@app.get("/histories/writer", response_model=HistoryWriterStatus)
+async def history_writer_status():
+    """Returns buffer size and flush latency of the History writer."""
+    return history_writer.status()
+
+
+@app.get("/idempotency/status", response_model=IdempotencyStatus)
+async def idempotency_status():
+    """Returns the size of the idempotency store and its replay and conflict counters."""
+    return idempotency_store.status()
+
+
+@app.get("/admission/status", response_model=AdmissionStatus)
+async def admission_status():
+    """Returns the limits, running and waiting requests and rejections of each route group."""
+    return admission.status()
+
+
+@app.get("/webhook/status", response_model=IngestStatus)
+async def webhook_status():
+    """Returns depth, lag and counters of the webhook ingestion queue."""
+    return webhook_queue.status()
+
+
+@app.get("/cache/stats", response_model=CacheStats)
+async def cache_stats():
+    """Returns hit, miss and eviction counters of the task cache."""
+    return task_cache.snapshot()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Returns request, database and service metrics in the Prometheus text format."""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/webhook-playground", response_model=UpdateWebhookStatus)
 async def webhook_playground(body: TasksActivityBody):
     """Simulate sending a webhook request to update task activity.
 
     This function accepts a `TasksActivityBody` object, converts it to JSON format, 
-    and sends it as a POST request to an external webhook endpoint. The response 
-    from the external endpoint is then returned as an instance of `UpdateWebhookStatus`.
+    and sends it as a POST request to the webhook endpoint through the shared
+    playground client. The response from the webhook is then returned as an
+    instance of `UpdateWebhookStatus`.
     """    
-    async with httpx.AsyncClient() as client:
-        json_payload = body.model_dump(exclude_none=True, mode="json")
-        response = await client.post(f"http://{HOST}:{PORT}/webhook", json=json_payload)
-        return UpdateWebhookStatus(**response.json())
+    result = await webhook_dispatcher.send(body.model_dump(exclude_none=True, mode="json"))
+    return UpdateWebhookStatus(success=result.success, message=result.message)
 
 
-register_tortoise(
-    app, db_url="sqlite://db.sqlite3", modules={"models": ["app.models.db_task"]}
-)
+@app.post("/webhook-playground/batch", response_model=PlaygroundBatchStatus)
+async def webhook_playground_batch(body: PlaygroundBatchBody):
+    """Sends many webhook payloads concurrently to load-test `/webhook`.
+
+    Every payload is sent `repeat` times with at most `concurrency` requests
+    in flight, and the response summarizes latency and throughput.
+    """
+    total = len(body.payloads) * body.repeat
+    if total > PLAYGROUND_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch of {total} requests exceeds the limit of {PLAYGROUND_BATCH_LIMIT}",
+        )
+    payloads = [payload.model_dump(exclude_none=True, mode="json") for payload in body.payloads]
+    return await webhook_dispatcher.send_many(payloads * body.repeat, body.concurrency)
+
+
+register_tortoise(app, config=tortoise_config())
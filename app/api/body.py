@@ -1,6 +1,6 @@
 from datetime import date, datetime
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Set
+from pydantic import BaseModel, ConfigDict, Field, create_model
 
 from ..models.enum import (
     ActivityName,
@@ -10,6 +10,8 @@ from ..models.enum import (
     Status,
     SubCategoryName,
 )
+from ..models.task import TasksActivityModel
+from .serialization import RENAMED
 
 
 class TasksActivityBody(BaseModel):
@@ -46,3 +48,48 @@ class TasksActivityBody(BaseModel):
     link_object_id: Optional[int] = Field(default=None)
     created_by: Optional[str] = Field(default=None)
     created_on: Optional[datetime] = Field(default=None)
+
+
+def task_fields(exclude: Set[str]) -> Dict[str, Any]:
+    """Field definitions of `TasksActivityModel` for a request body.
+
+    Bodies use the model field names, so renamed response keys such as
+    `assignt_to_company` are mapped back with `RENAMED`.
+
+    :param exclude: Response fields the client does not send
+    :return: Field definitions as accepted by `create_model`
+    :rtype: Dict[str, Any]
+    """
+    return {
+        RENAMED.get(name, name): (field.annotation, ...)
+        for name, field in TasksActivityModel.model_fields.items()
+        if name not in exclude
+    }
+
+
+# Derived from the response model so the JSON bodies cannot drift from it.
+# Numbers are accepted for text fields such as `attachments`, like the
+# form endpoints accept them.
+TasksActivityCreateBody = create_model(
+    "TasksActivityCreateBody",
+    __config__=ConfigDict(coerce_numbers_to_str=True),
+    **task_fields({"task_id", "created_on"}),
+)
+
+TasksActivityUpdateBody = create_model(
+    "TasksActivityUpdateBody",
+    __base__=TasksActivityCreateBody,
+    task_id=(int, ...),
+)
+
+
+class TasksActivityBulkBody(BaseModel):
+    create: List[TasksActivityCreateBody] = Field(default_factory=list)
+    update: List[TasksActivityBody] = Field(default_factory=list)
+    delete: List[int] = Field(default_factory=list)
+
+
+class PlaygroundBatchBody(BaseModel):
+    payloads: List[TasksActivityBody]
+    repeat: int = Field(default=1, ge=1)
+    concurrency: Optional[int] = Field(default=None, ge=1)
@@ -0,0 +1,226 @@
+from typing import Dict, List, Sequence, Set, Tuple, TypeVar
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from app.api.body import TasksActivityBody, TasksActivityCreateBody
+from app.api.responses import BulkItemStatus
+
+from ..cache import task_cache
+from ..const import BULK_CHUNK_SIZE
+from ..metrics import observe_history
+from ..models.database import WRITER
+from ..models.db_task import History, TasksActivity
+from ..models.enum import HistoryActionType
+
+T = TypeVar("T")
+
+
+def chunked(items: Sequence[T], size: int = BULK_CHUNK_SIZE) -> List[Tuple[int, Sequence[T]]]:
+    """Splits `items` into chunks of at most `size` items.
+
+    :return: List of (index of the first item, chunk) pairs
+    :rtype: List[Tuple[int, Sequence[T]]]
+    """
+    return [(start, items[start : start + size]) for start in range(0, len(items), size)]
+
+
+def failed_chunk(
+    action: HistoryActionType, start: int, size: int, error: Exception
+) -> List[BulkItemStatus]:
+    message = " ".join(i.__str__() for i in error.args)
+    return [
+        BulkItemStatus(success=False, message=message, action=action, index=start + i)
+        for i in range(size)
+    ]
+
+
+async def execute_bulk_update(
+    connection: BaseDBAsyncClient,
+    tasks: Sequence[TasksActivity],
+    field_names: Sequence[str],
+) -> None:
+    """Writes `field_names` of every task with one prepared UPDATE statement.
+
+    `Model.bulk_update` assumes the primary key is called `id`, which is not
+    the case for `TasksActivity`, so the executor is driven directly.
+    """
+    executor = connection.executor_class(model=TasksActivity, db=connection)
+    pk = TasksActivity._meta.pk
+    await connection.execute_many(
+        executor.get_update_sql(field_names, None),
+        [
+            [executor.column_map[name](getattr(task, name), task) for name in field_names]
+            + [pk.to_db_value(task.pk, task)]
+            for task in tasks
+        ],
+    )
+
+
+async def bulk_create_tasks(
+    bodies: Sequence[TasksActivityCreateBody],
+) -> List[BulkItemStatus]:
+    """Creates task activities in chunked transactions.
+
+    Every chunk is inserted with a single executemany and its History rows
+    with one `bulk_create`, both inside the same transaction.
+    """
+    results: List[BulkItemStatus] = []
+    for start, chunk in chunked(bodies):
+        try:
+            async with in_transaction(WRITER) as connection:
+                tasks = [TasksActivity(**body.model_dump()) for body in chunk]
+                await TasksActivity.bulk_create(tasks, using_db=connection)
+                # A single executemany holds the write lock, so SQLite hands
+                # out consecutive ids ending at last_insert_rowid().
+                rows = await connection.execute_query_dict(
+                    "SELECT last_insert_rowid() AS task_id"
+                )
+                first_id = rows[0]["task_id"] - len(tasks) + 1
+                for offset, task in enumerate(tasks):
+                    task.task_id = first_id + offset
+                await History.bulk_create(
+                    [
+                        History(
+                            task_id=task.task_id,
+                            action=HistoryActionType.CREATE,
+                            description=f"Task {task.task_id} was created by user",
+                        )
+                        for task in tasks
+                    ],
+                    using_db=connection,
+                )
+        except Exception as e:
+            results.extend(failed_chunk(HistoryActionType.CREATE, start, len(chunk), e))
+            continue
+        observe_history("bulk", len(tasks))
+        results.extend(
+            BulkItemStatus(
+                success=True,
+                message="Record added successfully",
+                action=HistoryActionType.CREATE,
+                index=start + offset,
+                task_id=task.task_id,
+            )
+            for offset, task in enumerate(tasks)
+        )
+    return results
+
+
+async def bulk_update_tasks(
+    bodies: Sequence[TasksActivityBody],
+) -> List[BulkItemStatus]:
+    """Applies partial updates to task activities in chunked transactions.
+
+    The tasks of a chunk are loaded with one query, and tasks that end up
+    with the same set of modified fields are written with one executemany.
+    """
+    results: List[BulkItemStatus] = []
+    for start, chunk in chunked(bodies):
+        statuses: List[BulkItemStatus] = []
+        try:
+            async with in_transaction(WRITER) as connection:
+                ids = {body.task_id for body in chunk}
+                tasks = {
+                    task.task_id: task
+                    for task in await TasksActivity.filter(task_id__in=ids).using_db(
+                        connection
+                    )
+                }
+                modified: Dict[int, Set[str]] = {}
+                history: List[History] = []
+                for offset, body in enumerate(chunk):
+                    task = tasks.get(body.task_id)
+                    if task is None:
+                        statuses.append(
+                            BulkItemStatus(
+                                success=False,
+                                message="Task Not Found",
+                                action=HistoryActionType.UPDATE,
+                                index=start + offset,
+                                task_id=body.task_id,
+                            )
+                        )
+                        continue
+                    payload_kwargs = body.model_dump(exclude={"task_id"}, exclude_none=True)
+                    for key, value in payload_kwargs.items():
+                        setattr(task, key, value)
+                    modified.setdefault(task.task_id, set()).update(payload_kwargs)
+                    history.append(
+                        History(
+                            task_id=task.task_id,
+                            action=HistoryActionType.UPDATE,
+                            description=f"Task {task.task_id} was updated: {', '.join(payload_kwargs)} were modified.",
+                        )
+                    )
+                    statuses.append(
+                        BulkItemStatus(
+                            success=True,
+                            message="Task Updated Succesfully",
+                            action=HistoryActionType.UPDATE,
+                            index=start + offset,
+                            task_id=task.task_id,
+                        )
+                    )
+                groups: Dict[frozenset, List[TasksActivity]] = {}
+                for task_id, field_names in modified.items():
+                    if field_names:
+                        groups.setdefault(frozenset(field_names), []).append(tasks[task_id])
+                for field_names, group in groups.items():
+                    await execute_bulk_update(connection, group, sorted(field_names))
+                if history:
+                    await History.bulk_create(history, using_db=connection)
+        except Exception as e:
+            results.extend(failed_chunk(HistoryActionType.UPDATE, start, len(chunk), e))
+            continue
+        observe_history("bulk", len(history))
+        await task_cache.invalidate_many(modified)
+        results.extend(statuses)
+    return results
+
+
+async def bulk_delete_tasks(task_ids: Sequence[int]) -> List[BulkItemStatus]:
+    """Deletes task activities in chunked transactions."""
+    results: List[BulkItemStatus] = []
+    for start, chunk in chunked(task_ids):
+        try:
+            async with in_transaction(WRITER) as connection:
+                existing = set(
+                    await TasksActivity.filter(task_id__in=set(chunk))
+                    .using_db(connection)
+                    .values_list("task_id", flat=True)
+                )
+                if existing:
+                    await TasksActivity.filter(task_id__in=existing).using_db(
+                        connection
+                    ).delete()
+                    await History.bulk_create(
+                        [
+                            History(
+                                task_id=task_id,
+                                action=HistoryActionType.DELETE,
+                                description=f"Task {task_id} was deleted by user",
+                            )
+                            for task_id in sorted(existing)
+                        ],
+                        using_db=connection,
+                    )
+        except Exception as e:
+            results.extend(failed_chunk(HistoryActionType.DELETE, start, len(chunk), e))
+            continue
+        observe_history("bulk", len(existing))
+        await task_cache.invalidate_many(existing)
+        deleted: Set[int] = set()
+        for offset, task_id in enumerate(chunk):
+            success = task_id in existing and task_id not in deleted
+            deleted.add(task_id)
+            results.append(
+                BulkItemStatus(
+                    success=success,
+                    message="Task deleted succesfully" if success else "Task Not Found",
+                    action=HistoryActionType.DELETE,
+                    index=start + offset,
+                    task_id=task_id,
+                )
+            )
+    return results
@@ -0,0 +1,63 @@
+import zlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: object) -> str:
+    """Builds a strong entity tag from version parts.
+
+    :return: Quoted entity tag
+    :rtype: str
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def digest(text: str) -> str:
+    """Short checksum of `text`, used to tell query-dependent representations apart."""
+    return format(zlib.crc32(text.encode()), "08x")
+
+
+def validators(etag: str, modified: Optional[datetime]) -> Dict[str, str]:
+    """Builds the `ETag` and `Last-Modified` headers of a response.
+
+    :return: Response headers
+    :rtype: Dict[str, str]
+    """
+    headers = {"ETag": etag}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            modified.astimezone(timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime]) -> bool:
+    """Evaluates `If-None-Match` and `If-Modified-Since` against the current validators.
+
+    `If-Modified-Since` is only considered when `If-None-Match` is absent.
+
+    :return: Whether the client's copy is current
+    :rtype: bool
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Empty 304 response carrying the validators."""
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,76 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Type, Union
+
+from pydantic import BaseModel
+from tortoise import Model
+from tortoise.queryset import QuerySet
+
+from app.api.pagination import next_cursor, paginate
+
+from ..const import EXPORT_CHUNK_SIZE
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def iterate_chunks(
+    queryset: QuerySet,
+    pk: str,
+    order: str,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[List[Model]]:
+    """Reads the rows of `queryset` in fixed-size chunks.
+
+    Chunks after the first one are fetched with keyset pagination, so only
+    one chunk is held in memory and every chunk costs the same to read.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = await paginate(queryset, pk, order, descending, size, offset, cursor)
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        if remaining is not None:
+            remaining -= len(rows)
+        offset = None
+        cursor = next_cursor(rows, pk, order, descending, size)
+
+
+def to_record(row: Union[Model, Dict[str, Any]], schema: Type[BaseModel]) -> BaseModel:
+    return row.to_model() if isinstance(row, Model) else schema.model_validate(row)  # type: ignore
+
+
+async def encode_rows(
+    chunks: AsyncIterator[List[Union[Model, Dict[str, Any]]]],
+    schema: Type[BaseModel],
+    format: ExportFormat,
+) -> AsyncIterator[str]:
+    """Encodes chunks of rows as NDJSON lines or CSV records.
+
+    Every row is converted with its `to_model()` method, and raw records,
+    such as archived History rows, are validated with `schema`, so the
+    exported records have the same shape as the list endpoints.
+    """
+    if format == "ndjson":
+        async for rows in chunks:
+            yield "".join(to_record(row, schema).model_dump_json() + "\n" for row in rows)
+        return
+    buffer = io.StringIO()
+    columns = list(schema.model_fields)
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    async for rows in chunks:
+        writer.writerows(to_record(row, schema).model_dump(mode="json") for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from tortoise.transactions import in_transaction
+
+from ..cache import task_cache
+from ..const import WEBHOOK_BATCH_SIZE, WEBHOOK_MODE, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+from ..metrics import observe_history
+from ..models.database import WRITER
+from ..models.db_task import History, TasksActivity
+from ..models.enum import HistoryActionType
+
+
+class IngestStatus(BaseModel):
+    enabled: bool
+    depth: int
+    capacity: int
+    inflight: int
+    workers: int
+    lag: float
+    accepted: int
+    coalesced: int
+    rejected: int
+    applied: int
+    missing: int
+    failed: int
+    batches: int
+    last_error: Optional[str] = None
+
+
+class WebhookQueue:
+    """Bounded queue of webhook updates applied by background workers.
+
+    Pending updates are keyed by task id: a payload for a task that is
+    already waiting is merged into the waiting update instead of taking
+    another slot, so bursts of updates to one task cost a single write.
+    A task is never applied by two workers at once, which keeps updates to
+    the same task in arrival order.
+    """
+
+    def __init__(self, enabled: bool, capacity: int, workers: int, batch_size: int) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pending: Dict[int, Tuple[Dict[str, Any], float]] = {}
+        self._inflight: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._stopping = False
+        self.accepted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.applied = 0
+        self.missing = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, task_id: int, changes: Dict[str, Any]) -> bool:
+        """Queues `changes` for `task_id`.
+
+        :return: False if the queue is full and the update was rejected
+        :rtype: bool
+        """
+        pending = self._pending.get(task_id)
+        if pending is not None:
+            pending[0].update(changes)
+            self.accepted += 1
+            self.coalesced += 1
+            return True
+        if len(self._pending) >= self.capacity:
+            self.rejected += 1
+            return False
+        self._pending[task_id] = (dict(changes), time.monotonic())
+        self.accepted += 1
+        self._wakeup.set()
+        return True
+
+    def status(self) -> IngestStatus:
+        now = time.monotonic()
+        oldest = min((since for _, since in self._pending.values()), default=now)
+        return IngestStatus(
+            enabled=self.enabled,
+            depth=len(self._pending),
+            capacity=self.capacity,
+            inflight=len(self._inflight),
+            workers=len(self._tasks),
+            lag=now - oldest,
+            accepted=self.accepted,
+            coalesced=self.coalesced,
+            rejected=self.rejected,
+            applied=self.applied,
+            missing=self.missing,
+            failed=self.failed,
+            batches=self.batches,
+            last_error=self.last_error,
+        )
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Applies every pending update, then stops the workers."""
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+
+    def _take(self) -> List[Tuple[int, Dict[str, Any]]]:
+        batch = []
+        for task_id in list(self._pending):
+            if task_id in self._inflight:
+                continue
+            batch.append((task_id, self._pending.pop(task_id)[0]))
+            self._inflight.add(task_id)
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            batch = self._take()
+            if not batch:
+                if self._stopping and not self._inflight:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                await self._apply(batch)
+            except Exception:
+                # One bad update must not drop the rest of the batch.
+                for item in batch:
+                    try:
+                        await self._apply([item])
+                    except Exception as e:
+                        self.failed += 1
+                        self.last_error = f"{e.__class__}:" + " ".join(i.__str__() for i in e.args)
+            finally:
+                self._inflight.difference_update(task_id for task_id, _ in batch)
+                self._wakeup.set()
+
+    async def _apply(self, batch: List[Tuple[int, Dict[str, Any]]]) -> None:
+        updated: List[int] = []
+        async with in_transaction(WRITER) as connection:
+            history = []
+            for task_id, changes in batch:
+                if not changes:
+                    continue
+                if await TasksActivity.filter(task_id=task_id).using_db(connection).update(
+                    **changes
+                ):
+                    updated.append(task_id)
+                    history.append(
+                        History(
+                            task_id=task_id,
+                            action=HistoryActionType.UPDATE,
+                            description=f"Task {task_id} was updated: {', '.join(changes)} were modified.",
+                        )
+                    )
+            if history:
+                await History.bulk_create(history, using_db=connection)
+        observe_history("queue", len(history))
+        self.batches += 1
+        self.applied += len(updated)
+        self.missing += len(batch) - len(updated)
+        await task_cache.invalidate_many(updated, "webhook")
+
+
+webhook_queue = WebhookQueue(
+    enabled=WEBHOOK_MODE == "queue",
+    capacity=WEBHOOK_QUEUE_SIZE,
+    workers=WEBHOOK_WORKERS,
+    batch_size=WEBHOOK_BATCH_SIZE,
+)
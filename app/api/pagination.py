@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Any, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Cursor(NamedTuple):
+    order: str
+    descending: bool
+    value: Any
+    pk: int
+
+
+def encode_cursor(order: str, descending: bool, value: Any, pk: int) -> str:
+    """Encodes the position of the last row of a page as an opaque token.
+
+    :param order: Name of the field the page is ordered by
+    :param descending: Whether the page is ordered from the end
+    :param value: Value of the ordering field in the last row
+    :param pk: Primary key of the last row, used as a tie-breaker
+    :return: URL-safe cursor token
+    :rtype: str
+    """
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps([order, int(descending), value, pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decodes a cursor token produced by `encode_cursor`.
+
+    :param token: Cursor token received from the client
+    :raises HTTPException: 400 if the token is malformed
+    :return: Decoded cursor
+    :rtype: Cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        order, descending, value, pk = json.loads(raw)
+        if not isinstance(order, str) or not isinstance(pk, int):
+            raise ValueError(token)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return Cursor(order, bool(descending), value, pk)
+
+
+def paginate(
+    queryset: QuerySet,
+    pk: str,
+    order: str,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> QuerySet:
+    """Applies ordering and offset or keyset pagination to a queryset.
+
+    With a cursor, the page starts right after the row the cursor points to,
+    so SQLite seeks through the index instead of scanning every skipped row.
+    `offset` keeps working for clients that do not send a cursor.
+
+    :param queryset: Queryset to paginate
+    :param pk: Name of the primary key field, used as a tie-breaker
+    :param order: Name of the field to order by
+    :param descending: Order from the end instead of from the beginning
+    :param limit: Maximum number of rows in the page
+    :param offset: Number of rows to skip
+    :param cursor: Cursor returned along with the previous page
+    :raises HTTPException: 400 if the cursor was issued for another ordering
+    :return: Paginated queryset
+    :rtype: QuerySet
+    """
+    direction = "__lt" if descending else "__gt"
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if position.order != order or position.descending != descending:
+            raise HTTPException(
+                status_code=400, detail="Cursor does not match the requested ordering"
+            )
+        if order == pk:
+            queryset = queryset.filter(**{pk + direction: position.pk})
+        else:
+            field = queryset.model._meta.fields_map[order]
+            value = field.to_python_value(position.value)
+            queryset = queryset.filter(
+                Q(**{order + direction: value})
+                | Q(**{order: value, pk + direction: position.pk})
+            )
+    prefix = "-" if descending else ""
+    if order == pk:
+        queryset = queryset.order_by(prefix + pk)
+    else:
+        queryset = queryset.order_by(prefix + order, prefix + pk)
+    if isinstance(offset, int):
+        queryset = queryset.offset(offset)
+    if limit is not None:
+        queryset = queryset.limit(limit)
+    return queryset
+
+
+def next_cursor(
+    rows: Sequence[Any],
+    pk: str,
+    order: str,
+    descending: bool = False,
+    limit: Optional[int] = None,
+) -> Optional[str]:
+    """Builds the cursor of the page following `rows`.
+
+    `rows` may hold model instances or dicts keyed by field name.
+
+    :return: Cursor token, or None when `rows` is the last page
+    :rtype: Optional[str]
+    """
+    if limit is None or not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):
+        return encode_cursor(order, descending, last[order], last[pk])
+    return encode_cursor(order, descending, getattr(last, order), getattr(last, pk))
@@ -0,0 +1,162 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.api.responses import UpdateWebhookStatus
+
+from ..const import (
+    HOST,
+    PLAYGROUND_CONCURRENCY,
+    PLAYGROUND_DISPATCH,
+    PLAYGROUND_URL,
+    PORT,
+)
+from ..idempotency import DEDUP_HEADER
+
+
+class PlaygroundResult(UpdateWebhookStatus):
+    index: int
+    status_code: int
+    latency: float
+
+
+class LatencySummary(BaseModel):
+    requests: int
+    succeeded: int
+    failed: int
+    concurrency: int
+    elapsed: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class PlaygroundBatchStatus(BaseModel):
+    summary: LatencySummary
+    results: List[PlaygroundResult]
+
+
+def percentile(latencies: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted `latencies`, 0 if there are none."""
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+
+class WebhookDispatcher:
+    """Sends playground payloads to `/webhook` through one shared client.
+
+    With `asgi` dispatch the request is handed to the application in the
+    same process, skipping the network and any dependency on `HOST` and
+    `PORT`. With `http` dispatch it goes to `PLAYGROUND_URL` over pooled
+    keep-alive connections, which exercises the full server stack.
+    """
+
+    def __init__(self, dispatch: str, url: str, concurrency: int) -> None:
+        if dispatch not in ("asgi", "http"):
+            raise ValueError(f"Unsupported PLAYGROUND_DISPATCH: {dispatch}")
+        self.dispatch = dispatch
+        self.url = url
+        self.concurrency = concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self, app: FastAPI) -> None:
+        # Repeated payloads are the point of a load test, not retries.
+        headers = {DEDUP_HEADER: "off"}
+        if self.dispatch == "asgi":
+            self._client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://playground",
+                headers=headers,
+            )
+        else:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send(self, payload: Dict[str, Any], index: int = 0) -> PlaygroundResult:
+        """Posts one payload to `/webhook`.
+
+        :return: Status returned by the webhook, with HTTP status and latency in seconds
+        :rtype: PlaygroundResult
+        """
+        if self._client is None:
+            raise RuntimeError("Webhook dispatcher is not started")
+        started = time.perf_counter()
+        try:
+            response = await self._client.post("/webhook", json=payload)
+            status = UpdateWebhookStatus(**response.json())
+            status_code = response.status_code
+        except Exception as e:
+            status = UpdateWebhookStatus(
+                success=False,
+                message=f"{e.__class__}:" + " ".join(i.__str__() for i in e.args),
+            )
+            status_code = 0
+        return PlaygroundResult(
+            **status.model_dump(),
+            index=index,
+            status_code=status_code,
+            latency=time.perf_counter() - started,
+        )
+
+    async def send_many(
+        self, payloads: Sequence[Dict[str, Any]], concurrency: Optional[int] = None
+    ) -> PlaygroundBatchStatus:
+        """Posts payloads concurrently, with at most `concurrency` in flight.
+
+        :return: Per-payload results in input order and a latency summary
+        :rtype: PlaygroundBatchStatus
+        """
+        concurrency = max(1, concurrency or self.concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(index: int, payload: Dict[str, Any]) -> PlaygroundResult:
+            async with semaphore:
+                return await self.send(payload, index)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(send(index, payload) for index, payload in enumerate(payloads))
+        )
+        elapsed = time.perf_counter() - started
+        latencies = sorted(result.latency for result in results)
+        succeeded = sum(result.success for result in results)
+        return PlaygroundBatchStatus(
+            summary=LatencySummary(
+                requests=len(results),
+                succeeded=succeeded,
+                failed=len(results) - succeeded,
+                concurrency=concurrency,
+                elapsed=elapsed,
+                throughput=len(results) / elapsed if elapsed else 0.0,
+                p50=percentile(latencies, 0.50),
+                p95=percentile(latencies, 0.95),
+                p99=percentile(latencies, 0.99),
+                max=latencies[-1] if latencies else 0.0,
+            ),
+            results=results,
+        )
+
+
+webhook_dispatcher = WebhookDispatcher(
+    dispatch=PLAYGROUND_DISPATCH,
+    url=PLAYGROUND_URL or f"http://{'127.0.0.1' if HOST == '0.0.0.0' else HOST}:{PORT}",
+    concurrency=PLAYGROUND_CONCURRENCY,
+)
@@ -1,7 +1,9 @@
-from typing import Optional
+from datetime import date
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
-from app.models.task import TasksActivityModel
+from app.models.enum import HistoryActionType
+from app.models.task import HistoryModel, TasksActivityModel
 
 
 class Status(BaseModel):
@@ -29,3 +31,56 @@ class CreateTaskResponse(BaseModel):
 
 class TaskResponse(CreateTaskResponse):
     pass
+
+
+class BulkItemStatus(Status):
+    action: HistoryActionType
+    index: int
+    task_id: Optional[int] = None
+
+
+class BulkStatus(Status):
+    results: List[BulkItemStatus]
+
+
+class TaskQueryResponse(BaseModel):
+    data: List[TasksActivityModel]
+    next_cursor: Optional[str] = None
+    plan: Optional[List[str]] = None
+
+
+class SearchHit(BaseModel):
+    rank: float
+    snippet: str
+    data: TasksActivityModel
+
+
+class SearchResponse(BaseModel):
+    data: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+class DailyCount(BaseModel):
+    day: date
+    create: int = 0
+    update: int = 0
+    delete: int = 0
+
+
+class StatsResponse(BaseModel):
+    total: int
+    status: Dict[str, int]
+    stage_name: Dict[str, int]
+    activity_group_name: Dict[str, int]
+    core_group_category: Dict[str, int]
+    daily: List[DailyCount]
+
+
+class RecomputeStatus(Status):
+    drift: int
+
+
+class TaskHistoryResponse(BaseModel):
+    task: Optional[TasksActivityModel] = None
+    data: List[HistoryModel]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,188 @@
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from tortoise import Model
+from tortoise.queryset import QuerySet
+
+from app.api.pagination import next_cursor
+
+from ..metrics import observe_serialization
+from ..models.database import read_connection
+from ..models.fields import EnumCodeFieldInstance
+from ..models.task import HistoryModel, TasksActivityModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+# Keys of the response schema that differ from the ORM field they are read from.
+RENAMED = {"assignt_to_company": "assign_to_company"}
+
+
+def columns_of(schema: Type[BaseModel]) -> List[Tuple[str, str]]:
+    """Lists the (ORM field, response key) pairs of a response schema."""
+    return [(RENAMED.get(key, key), key) for key in schema.model_fields]
+
+
+TASK_COLUMNS = columns_of(TasksActivityModel)
+HISTORY_COLUMNS = columns_of(HistoryModel)
+
+
+def encode_datetime(value: Any) -> Any:
+    """Formats a stored datetime the way pydantic serializes it.
+
+    SQLite stores datetimes as `YYYY-MM-DD HH:MM:SS[.ffffff]+00:00` text,
+    which only needs its separator and UTC suffix rewritten.
+    """
+    if isinstance(value, str):
+        if value.endswith("+00:00"):
+            return value[:-6].replace(" ", "T", 1) + "Z"
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return value
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def dumps(content: Any, sort_keys: bool = False) -> bytes:
+    """Encodes `content` as compact JSON, with orjson when it is installed.
+
+    :param sort_keys: Sort object keys, for a canonical encoding
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(",", ":"), default=_default, sort_keys=sort_keys
+    ).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Decodes JSON, with orjson when it is installed.
+
+    :raises ValueError: If `data` is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+async def fetch_records(
+    queryset: QuerySet, columns: Sequence[Tuple[str, str]]
+) -> List[Dict[str, Any]]:
+    """Runs `queryset` and returns its rows as response-ready dicts.
+
+    Rows are read as plain tuples, skipping ORM instances and per-row
+    pydantic models. Date columns are already stored in their serialized
+    form; datetimes are reformatted and enum codes mapped to their values.
+
+    :param queryset: Filtered, ordered and paginated queryset
+    :param columns: (ORM field, response key) pairs to select
+    :return: One dict per row, keyed like the response schema
+    :rtype: List[Dict[str, Any]]
+    """
+    model: Type[Model] = queryset.model
+    query = queryset.values_list(*(field for field, _ in columns)).sql()
+    keys = [key for _, key in columns]
+    datetimes = [
+        index
+        for index, (field, _) in enumerate(columns)
+        if model._meta.fields_map[field].field_type is datetime
+    ]
+    enums = [
+        (keys[index], model._meta.fields_map[field].decoded)
+        for index, (field, _) in enumerate(columns)
+        if isinstance(model._meta.fields_map[field], EnumCodeFieldInstance)
+    ]
+    _, rows = await read_connection().execute_query(query)
+    records = []
+    for row in rows:
+        record = dict(zip(keys, row))
+        for index in datetimes:
+            record[keys[index]] = encode_datetime(row[index])
+        for key, decoded in enums:
+            record[key] = decoded.get(record[key], record[key])
+        records.append(record)
+    return records
+
+
+def select_columns(
+    columns: Sequence[Tuple[str, str]], fields: Optional[str]
+) -> List[Tuple[str, str]]:
+    """Picks the columns named in a `fields` query parameter.
+
+    :param columns: Every (ORM field, response key) pair of the schema
+    :param fields: Comma-separated response keys, or None for all of them
+    :raises HTTPException: 400 if a name is not part of the schema
+    :return: Requested columns, in request order
+    :rtype: List[Tuple[str, str]]
+    """
+    if fields is None:
+        return list(columns)
+    by_key = {key: (field, key) for field, key in columns}
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in by_key]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested",
+        )
+    return [by_key[name] for name in requested]
+
+
+async def fetch_page(
+    queryset: QuerySet,
+    columns: Sequence[Tuple[str, str]],
+    pk: str,
+    order: str,
+    descending: bool = False,
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetches a page of records and the cursor of the next page.
+
+    The primary key and ordering field are selected even when they are not
+    part of `columns`, to build the cursor, and dropped afterwards.
+
+    :return: Records and next cursor
+    :rtype: Tuple[List[Dict[str, Any]], Optional[str]]
+    """
+    keys = {key for _, key in columns}
+    hidden = [(name, name) for name in dict.fromkeys((pk, order)) if name not in keys]
+    records = await fetch_records(queryset, list(columns) + hidden)
+    token = next_cursor(records, pk, order, descending, limit)
+    for record in records if hidden else ():
+        for name, _ in hidden:
+            del record[name]
+    return records, token
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = dumps(content)
+        observe_serialization(time.perf_counter() - started)
+        return body
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default JSON response, with encoding time reported to the metrics."""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        observe_serialization(time.perf_counter() - started)
+        return body
@@ -0,0 +1,443 @@
+import asyncio
+import contextlib
+from bisect import bisect_left
+import fcntl
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from tortoise import Tortoise, run_async
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from .api.pagination import decode_cursor, next_cursor, paginate
+from .api.serialization import HISTORY_COLUMNS, fetch_records
+from .const import ARCHIVE_BLOCK_SIZE, ARCHIVE_DIR, EXPORT_CHUNK_SIZE, HISTORY_RETENTION_DAYS
+from .models.database import WRITER, tortoise_config
+from .models.db_task import History
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveBusy(RuntimeError):
+    """Raised when another process holds the archive lock."""
+
+
+class ArchiveBlock(BaseModel):
+    offset: int
+    length: int
+    count: int
+    first_id: int
+    last_id: int
+    min_time: datetime
+    max_time: datetime
+    task_ids: List[int]
+
+
+class ArchiveIndex(BaseModel):
+    month: str
+    size: int = 0
+    blocks: List[ArchiveBlock] = []
+
+
+class ArchiveStatus(BaseModel):
+    cutoff: datetime
+    archived: int
+    deleted: int
+    watermark: int
+    months: List[str]
+
+
+def parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def contains(values: List[int], value: int) -> bool:
+    """Membership test on a sorted list."""
+    position = bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+def as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class HistoryArchive:
+    """Append-only, gzip-compressed archive of History rows, one segment per month.
+
+    Each segment `history-YYYY-MM.jsonl.gz` is a sequence of gzip members
+    (blocks) of at most `block_size` rows, and its sidecar
+    `history-YYYY-MM.index.json` lists every block with its byte range, id
+    range, time range and task ids. Queries read the sidecars and only
+    decompress the blocks that can match.
+
+    Rows are archived in id order and only ids below the oldest kept row,
+    so the archive and the History table never overlap: an archived row
+    whose id is still in the table is a leftover of an interrupted run.
+    """
+
+    def __init__(self, directory: str, block_size: int) -> None:
+        self.directory = directory
+        self.block_size = block_size
+        self._indexes: Dict[str, Tuple[float, ArchiveIndex]] = {}
+
+    def segment_path(self, month: str) -> str:
+        return os.path.join(self.directory, f"history-{month}.jsonl.gz")
+
+    def index_path(self, month: str) -> str:
+        return os.path.join(self.directory, f"history-{month}.index.json")
+
+    def months(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[len("history-") : -len(".index.json")]
+            for name in os.listdir(self.directory)
+            if name.startswith("history-") and name.endswith(".index.json")
+        )
+
+    def index(self, month: str) -> ArchiveIndex:
+        path = self.index_path(month)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return ArchiveIndex(month=month)
+        cached = self._indexes.get(month)
+        if cached is None or cached[0] != mtime:
+            with open(path) as file:
+                cached = self._indexes[month] = (mtime, ArchiveIndex.model_validate_json(file.read()))
+        return cached[1]
+
+    def watermark(self) -> int:
+        """Highest archived History id, 0 if nothing was archived yet."""
+        return max(
+            (block.last_id for month in self.months() for block in self.index(month).blocks),
+            default=0,
+        )
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        """Holds the archive lock, which keeps server processes from archiving concurrently."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ArchiveBusy("History archival is already running")
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def append(self, month: str, records: List[Dict[str, Any]]) -> ArchiveBlock:
+        """Appends `records` to the segment of `month` as one block.
+
+        The block is synced to disk before the sidecar is replaced, and bytes
+        past the indexed size, left by an interrupted append, are dropped
+        first, so the sidecar only ever describes complete blocks.
+
+        :param records: Rows of one month, ordered by id
+        :return: Indexed block
+        :rtype: ArchiveBlock
+        """
+        index = self.index(month)
+        data = gzip.compress(
+            b"".join(json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records)
+        )
+        with open(self.segment_path(month), "ab") as file:
+            file.truncate(index.size)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        times = [parse_time(record["time"]) for record in records]
+        block = ArchiveBlock(
+            offset=index.size,
+            length=len(data),
+            count=len(records),
+            first_id=records[0]["id"],
+            last_id=records[-1]["id"],
+            min_time=min(times),
+            max_time=max(times),
+            task_ids=sorted({record["task_id"] for record in records}),
+        )
+        updated = ArchiveIndex(month=month, size=index.size + len(data), blocks=index.blocks + [block])
+        temporary = self.index_path(month) + ".tmp"
+        with open(temporary, "w") as file:
+            file.write(updated.model_dump_json())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.index_path(month))
+        return block
+
+    def read_block(self, month: str, block: ArchiveBlock) -> List[Dict[str, Any]]:
+        with open(self.segment_path(month), "rb") as file:
+            file.seek(block.offset)
+            data = gzip.decompress(file.read(block.length))
+        return [json.loads(line) for line in data.splitlines()]
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        descending: bool = False,
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+        task_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reads archived rows matching the filters, ordered by id.
+
+        :param after: Only rows past this id in the requested order (cursor)
+        :param before: Only ids below this one, the oldest id of the table
+        :param since: Only rows at or after this time
+        :param until: Only rows before this time
+        :return: At most `limit` rows
+        :rtype: List[Dict[str, Any]]
+        """
+        since = as_utc(since) if since else None
+        until = as_utc(until) if until else None
+        blocks = [
+            (month, block)
+            for month in self.months()
+            for block in self.index(month).blocks
+            if (task_id is None or contains(block.task_ids, task_id))
+            and (since is None or block.max_time >= since)
+            and (until is None or block.min_time < until)
+            and (before is None or block.first_id < before)
+            and (after is None or (block.first_id < after if descending else block.last_id > after))
+        ]
+
+        def matches(record: Dict[str, Any]) -> bool:
+            if before is not None and record["id"] >= before:
+                return False
+            if after is not None and (record["id"] >= after if descending else record["id"] <= after):
+                return False
+            if task_id is not None and record["task_id"] != task_id:
+                return False
+            if since is None and until is None:
+                return True
+            time = parse_time(record["time"])
+            return (since is None or time >= since) and (until is None or time < until)
+
+        # Blocks of different months may interleave in id order, so rows are
+        # only emitted once no later block can hold a smaller (or, from the
+        # end, larger) id.
+        if descending:
+            blocks.sort(key=lambda item: item[1].last_id, reverse=True)
+        else:
+            blocks.sort(key=lambda item: item[1].first_id)
+        records: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = []
+        for position, (month, block) in enumerate(blocks):
+            pending.extend(record for record in self.read_block(month, block) if matches(record))
+            pending.sort(key=lambda record: record["id"], reverse=descending)
+            if position + 1 < len(blocks):
+                following = blocks[position + 1][1]
+                final = [
+                    record
+                    for record in pending
+                    if (record["id"] > following.last_id if descending else record["id"] < following.first_id)
+                ]
+            else:
+                final = pending
+            records.extend(final)
+            pending = pending[len(final) :]
+            if limit is not None and len(records) >= limit:
+                return records[:limit]
+        return records
+
+
+history_archive = HistoryArchive(ARCHIVE_DIR, ARCHIVE_BLOCK_SIZE)
+
+
+async def fetch_history_page(
+    queryset: QuerySet,
+    columns: Sequence[Tuple[str, str]],
+    oldest: Optional[int],
+    descending: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    archive: HistoryArchive = history_archive,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Reads a page of History rows from the archive and the table, ordered by id.
+
+    Archived ids all precede the table's, so the page continues from one
+    into the other; `queryset` must apply the same filters as `task_id`,
+    `since` and `until`.
+
+    :param oldest: Oldest id still in the table, None if it is empty
+    :raises HTTPException: 400 if the cursor was issued for another ordering
+    :return: Records keyed like `columns` and the next cursor
+    :rtype: Tuple[List[Dict[str, Any]], Optional[str]]
+    """
+    after = None
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if position.order != "id" or position.descending != descending:
+            raise HTTPException(
+                status_code=400, detail="Cursor does not match the requested ordering"
+            )
+        after = position.pk
+
+    async def archived(count: Optional[int]) -> List[Dict[str, Any]]:
+        if count == 0:
+            return []
+        return await asyncio.to_thread(
+            archive.query, count, descending, after, oldest, task_id, since, until
+        )
+
+    async def table(count: Optional[int]) -> List[Dict[str, Any]]:
+        if count == 0:
+            return []
+        return await fetch_records(
+            paginate(queryset, "id", "id", descending, count, None, cursor), HISTORY_COLUMNS
+        )
+
+    def remaining(records: List[Dict[str, Any]]) -> Optional[int]:
+        return None if limit is None else max(limit - len(records), 0)
+
+    if descending:
+        records = await table(limit)
+        records += await archived(remaining(records))
+    else:
+        records = await archived(limit)
+        records += await table(remaining(records))
+    token = next_cursor(records, "id", "id", descending, limit)
+    keys = [key for _, key in columns]
+    return [{key: record[key] for key in keys} for record in records], token
+
+
+async def iterate_history_pages(
+    queryset: QuerySet,
+    oldest: Optional[int],
+    descending: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Reads History rows of the archive and the table in fixed-size pages, ordered by id.
+
+    Takes the same arguments as `fetch_history_page` and follows its
+    cursors, so an export holds one page in memory at a time. The first
+    page is read before returning, so an invalid cursor fails the request
+    instead of the stream.
+
+    :raises HTTPException: 400 if the cursor was issued for another ordering
+    """
+
+    async def page(size: Optional[int], cursor: Optional[str]):
+        return await fetch_history_page(
+            queryset, HISTORY_COLUMNS, oldest, descending, size, cursor, task_id, since, until
+        )
+
+    def size(remaining: Optional[int]) -> int:
+        return chunk_size if remaining is None else min(chunk_size, remaining)
+
+    records, cursor = await page(size(limit), cursor)
+
+    async def pages(
+        records: List[Dict[str, Any]], cursor: Optional[str]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        remaining = limit
+        while True:
+            if records:
+                yield records
+            if remaining is not None:
+                remaining -= len(records)
+            if cursor is None or remaining == 0:
+                return
+            records, cursor = await page(size(remaining), cursor)
+
+    return pages(records, cursor)
+
+
+async def archive_history(
+    archive: HistoryArchive = history_archive,
+    retention_days: float = HISTORY_RETENTION_DAYS,
+) -> ArchiveStatus:
+    """Moves History rows older than `retention_days` into the archive.
+
+    Rows are copied `block_size` at a time in id order, and every copied
+    batch is deleted from the table in its own short transaction, so
+    writers are never blocked for long. Only the prefix of ids before the
+    oldest row to keep is archived.
+
+    :raises ArchiveBusy: If another process is archiving
+    :return: Counts of the run
+    :rtype: ArchiveStatus
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    archived = deleted = 0
+    with archive.lock():
+        watermark = await asyncio.to_thread(archive.watermark)
+        keep = await History.filter(time__gte=cutoff).order_by("id").first()
+        boundary = keep.id if keep else None
+        async with in_transaction(WRITER) as connection:
+            # Rows archived by an interrupted run are still in the table.
+            deleted += await History.filter(id__lte=watermark).using_db(connection).delete()
+        while True:
+            queryset = History.filter(id__gt=watermark).order_by("id").limit(archive.block_size)
+            if boundary is not None:
+                queryset = queryset.filter(id__lt=boundary)
+            records = await fetch_records(queryset, HISTORY_COLUMNS)
+            if not records:
+                break
+            months: Dict[str, List[Dict[str, Any]]] = {}
+            for record in records:
+                months.setdefault(record["time"][:7], []).append(record)
+            for month, rows in months.items():
+                await asyncio.to_thread(archive.append, month, rows)
+            archived += len(records)
+            async with in_transaction(WRITER) as connection:
+                deleted += await History.filter(
+                    id__gt=watermark, id__lte=records[-1]["id"]
+                ).using_db(connection).delete()
+            watermark = records[-1]["id"]
+    return ArchiveStatus(
+        cutoff=cutoff,
+        archived=archived,
+        deleted=deleted,
+        watermark=watermark,
+        months=archive.months(),
+    )
+
+
+async def archive_periodically(interval: float) -> None:
+    """Archives old History rows every `interval` seconds.
+
+    Every server process runs this loop; a process whose turn overlaps a
+    run of another one skips it. A failed run is logged and retried at the
+    next turn.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await archive_history()
+        except ArchiveBusy:
+            pass
+        except Exception:
+            logger.exception("History archival failed")
+
+
+async def ArchiveDB(retention_days: float = HISTORY_RETENTION_DAYS):
+    """Archive History rows older than `retention_days` and print the counts.
+
+    :return: None
+    """
+    await Tortoise.init(config=tortoise_config())
+    print((await archive_history(retention_days=retention_days)).model_dump_json(indent=2))
+
+
+def Archive(retention_days: float = HISTORY_RETENTION_DAYS):
+    run_async(ArchiveDB(retention_days))
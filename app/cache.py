@@ -0,0 +1,295 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Type,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+from .const import CACHE_URL, TASK_CACHE_SIZE, TASK_CACHE_TTL
+from .models.database import read_connection
+from .models.db_task import TasksActivity
+from .models.revision import read_task_revision
+from .models.task import TasksActivityModel
+
+K = TypeVar("K")
+V = TypeVar("V", bound=BaseModel)
+
+MISSING: Any = object()
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    coalesced: int = 0
+    invalidations: int = 0
+    backend_hits: int = 0
+    backend_errors: int = 0
+    size: int = 0
+    maxsize: int = 0
+
+
+class SharedBackend:
+    """Cache storage shared between processes.
+
+    Values are stored as bytes so any key-value store can back the cache.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(SharedBackend):
+    """In-process stand-in for a shared backend, used for local runs and tests."""
+
+    def __init__(self) -> None:
+        self._values: Dict[str, tuple] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value, expires = self._values.get(key, (None, 0.0))
+        if value is not None and expires < time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._values[key] = (value, time.monotonic() + ttl)
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+
+class RedisBackend(SharedBackend):
+    """Shared backend stored in Redis, requires the optional `redis` package."""
+
+    def __init__(self, url: str) -> None:
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points to Redis but `redis` is not installed")
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+
+def backend_from_url(url: str) -> Optional[SharedBackend]:
+    """Creates the shared backend configured by `url`.
+
+    :param url: Empty for no shared backend, `memory://` or `redis://...`
+    :return: Shared backend or None
+    :rtype: Optional[SharedBackend]
+    """
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+class LRUCache(Generic[K, V]):
+    """Least recently used cache with a size bound and a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float, stats: CacheStats) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = stats
+        self._entries: "OrderedDict[K, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        value, expires = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ReadThroughCache(Generic[K, V]):
+    """Read-through cache in front of a loader coroutine.
+
+    Lookups check the in-process LRU, then the optional shared backend, and
+    finally call the loader. Concurrent misses for the same key share one
+    loader call. Keys invalidated while they are being loaded are not
+    stored, so a write can never be shadowed by an older read. Every write
+    path invalidates the keys it changed, so `listeners` are told of every
+    change as well, along with the `origin` the writer passed.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        schema: Type[V],
+        loader: Callable[[K], Awaitable[Optional[V]]],
+        maxsize: int,
+        ttl: float,
+        backend: Optional[SharedBackend] = None,
+    ) -> None:
+        self.namespace = namespace
+        self.schema = schema
+        self.loader = loader
+        self.ttl = ttl
+        self.backend = backend
+        self.stats = CacheStats(maxsize=maxsize)
+        self.local: LRUCache[K, V] = LRUCache(maxsize, ttl, self.stats)
+        self._inflight: Dict[K, "asyncio.Task[Optional[V]]"] = {}
+        self._stale: Set[K] = set()
+        self.listeners: List[Callable[[K, str], Awaitable[None]]] = []
+
+    def _key(self, key: K) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: K) -> Optional[V]:
+        """Returns the cached value of `key`, loading it on a miss.
+
+        :return: Value, or None if the loader did not find it
+        :rtype: Optional[V]
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.stats.hits += 1
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self.stats.misses += 1
+            # A task of its own, so a caller that is cancelled, e.g. by a
+            # client disconnect, leaves the load running for the others.
+            inflight = self._inflight[key] = asyncio.ensure_future(self._fill(key))
+            # Retrieve the exception so a load nobody waits for does not warn.
+            inflight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            self.stats.coalesced += 1
+        return await asyncio.shield(inflight)
+
+    async def _fill(self, key: K) -> Optional[V]:
+        try:
+            value = await self._load(key)
+        finally:
+            del self._inflight[key]
+            stale = key in self._stale
+            self._stale.discard(key)
+        if value is not None and not stale:
+            self.local.set(key, value)
+        return value
+
+    async def _load(self, key: K) -> Optional[V]:
+        if self.backend is not None:
+            try:
+                raw = await self.backend.get(self._key(key))
+            except Exception:
+                self.stats.backend_errors += 1
+                raw = None
+            if raw is not None:
+                self.stats.backend_hits += 1
+                return self.schema.model_validate_json(raw)
+        value = await self.loader(key)
+        if value is not None and self.backend is not None and key not in self._stale:
+            try:
+                await self.backend.set(self._key(key), value.model_dump_json().encode(), self.ttl)
+                if key in self._stale:
+                    await self.backend.delete(self._key(key))
+            except Exception:
+                self.stats.backend_errors += 1
+        return value
+
+    async def invalidate(self, key: K, origin: str = "write") -> None:
+        """Drops `key` from every cache level after it was written.
+
+        :param origin: Kind of write, passed on to the listeners
+        """
+        self.stats.invalidations += 1
+        for listener in self.listeners:
+            await listener(key, origin)
+        self.local.delete(key)
+        if key in self._inflight:
+            self._stale.add(key)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(self._key(key))
+            except Exception:
+                self.stats.backend_errors += 1
+
+    async def invalidate_many(self, keys: Iterable[K], origin: str = "write") -> None:
+        for key in keys:
+            await self.invalidate(key, origin)
+
+    def snapshot(self) -> CacheStats:
+        return self.stats.model_copy(update={"size": len(self.local)})
+
+
+class CachedTask(BaseModel):
+    task: TasksActivityModel
+    version: int
+    modified: datetime
+
+
+async def load_task(task_id: int) -> Optional[CachedTask]:
+    # The version is read before the row: a write in between pairs the new
+    # row with the old version, which costs the client one extra download,
+    # never a stale 304.
+    revision = await read_task_revision(read_connection(), task_id)
+    task = await TasksActivity.filter(task_id=task_id).first()
+    if task is None or revision is None:
+        return None
+    version, modified = revision
+    return CachedTask(task=task.to_model(), version=version, modified=modified)
+
+
+task_cache: ReadThroughCache[int, CachedTask] = ReadThroughCache(
+    "task",
+    CachedTask,
+    load_task,
+    maxsize=TASK_CACHE_SIZE,
+    ttl=TASK_CACHE_TTL,
+    backend=backend_from_url(CACHE_URL),
+)
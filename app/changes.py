@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Set
+
+from pydantic import BaseModel
+
+from .api.serialization import dumps, encode_datetime
+from .const import (
+    CHANGES_BATCH_SIZE,
+    CHANGES_BUFFER_SIZE,
+    CHANGES_HEARTBEAT,
+    CHANGES_POLL_INTERVAL,
+)
+from .models.database import read_connection
+
+# History rows with the current core group of their task, which is NULL
+# once the task is deleted.
+CHANGES_QUERY = (
+    'SELECT h.id, h.task_id, h.action, h.description, h.time, t.CoreGroupID AS core_group_id '
+    'FROM "History" h LEFT JOIN "TasksActivity" t ON t.TaskID = h.task_id '
+    "WHERE h.id > ?"
+)
+
+
+class ChangeFeedStatus(BaseModel):
+    subscribers: int
+    position: Optional[int]
+    buffer_size: int
+    poll_interval: float
+    polls: int
+    published: int
+    delivered: int
+    evicted: int
+    last_error: Optional[str] = None
+
+
+class Change(NamedTuple):
+    id: int
+    task_id: int
+    core_group_id: Optional[int]
+    message: bytes
+
+
+def encode_change(row: Dict[str, Any]) -> Change:
+    """Builds the Server-Sent Event of a History row, encoded once for every subscriber."""
+    data = dict(row, time=encode_datetime(row["time"]))
+    return Change(
+        id=row["id"],
+        task_id=row["task_id"],
+        core_group_id=row["core_group_id"],
+        message=b"id: %d\nevent: %s\ndata: %s\n\n"
+        % (row["id"], row["action"].encode(), dumps(data)),
+    )
+
+
+class Subscriber:
+    """One open stream: its filters and a bounded queue of pending events."""
+
+    def __init__(self, task_id: Optional[int], core_group_id: Optional[int], size: int) -> None:
+        self.task_id = task_id
+        self.core_group_id = core_group_id
+        self.queue: "asyncio.Queue[Optional[Change]]" = asyncio.Queue(size)
+        self.position = 0
+        self.evicted = False
+        self.closed = False
+
+    def matches(self, change: Change) -> bool:
+        # Deleted tasks have no core group anymore, so their changes reach
+        # every core group subscriber.
+        return (self.task_id is None or change.task_id == self.task_id) and (
+            self.core_group_id is None
+            or change.core_group_id is None
+            or change.core_group_id == self.core_group_id
+        )
+
+
+class ChangeFeed:
+    """Fans out new History rows to Server-Sent Event subscribers.
+
+    One task per process tails `History` by id while anyone is subscribed,
+    so changes written by every worker and write path are seen, and the
+    read cost does not grow with the number of subscribers. SQLite commits
+    writes one at a time, in id order, so the tail never skips a row.
+
+    Every subscriber has a queue of at most `buffer_size` events. A
+    subscriber whose queue is full is evicted instead of slowing the tail
+    down; its stream ends with an `evicted` event and the client resumes
+    from its last event id.
+    """
+
+    def __init__(self, poll_interval: float, buffer_size: int, batch_size: int) -> None:
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.position: Optional[int] = None
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._wakeup = asyncio.Event()
+        self.polls = 0
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+        self.last_error: Optional[str] = None
+
+    def status(self) -> ChangeFeedStatus:
+        return ChangeFeedStatus(
+            subscribers=len(self._subscribers),
+            position=self.position,
+            buffer_size=self.buffer_size,
+            poll_interval=self.poll_interval,
+            polls=self.polls,
+            published=self.published,
+            delivered=self.delivered,
+            evicted=self.evicted,
+            last_error=self.last_error,
+        )
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._tail())
+
+    async def stop(self) -> None:
+        """Stops the tail and ends every open stream."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for subscriber in list(self._subscribers):
+            self._close(subscriber)
+
+    async def subscribe(
+        self, task_id: Optional[int] = None, core_group_id: Optional[int] = None
+    ) -> Subscriber:
+        """Registers a subscriber for every change after the current tail position.
+
+        :return: Subscriber whose `position` is the last id it will not receive
+        :rtype: Subscriber
+        """
+        if self.position is None:
+            rows = await read_connection().execute_query_dict(
+                'SELECT MAX(id) AS id FROM "History"'
+            )
+            if self.position is None:
+                self.position = rows[0]["id"] or 0
+        subscriber = Subscriber(task_id, core_group_id, self.buffer_size)
+        # No await between reading the position and registering, so the
+        # tail publishes exactly the rows after it to this subscriber.
+        subscriber.position = self.position
+        self._subscribers.add(subscriber)
+        self._wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def _close(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        subscriber.closed = True
+        with contextlib.suppress(asyncio.QueueFull):
+            subscriber.queue.put_nowait(None)
+
+    def publish(self, changes: List[Change]) -> None:
+        for change in changes:
+            for subscriber in list(self._subscribers):
+                if not subscriber.matches(change):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(change)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    # The stream drains what it has queued, then ends.
+                    subscriber.evicted = True
+                    self._subscribers.discard(subscriber)
+                    self.evicted += 1
+            self.position = change.id
+        self.published += len(changes)
+
+    async def _tail(self) -> None:
+        while True:
+            if not self._subscribers:
+                # Nobody listens: stop reading, and start again from the
+                # end of the table with the next subscriber.
+                self.position = None
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                rows = await read_connection().execute_query_dict(
+                    CHANGES_QUERY + " ORDER BY h.id LIMIT ?",
+                    [self.position or 0, self.batch_size],
+                )
+                self.polls += 1
+                self.publish([encode_change(row) for row in rows])
+            except Exception as e:
+                rows = []
+                self.last_error = f"{e.__class__}:" + " ".join(i.__str__() for i in e.args)
+            if len(rows) < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def replay(self, subscriber: Subscriber, after: int) -> AsyncIterator[bytes]:
+        """Reads the changes between `after` and the subscriber's position from the database."""
+        query = CHANGES_QUERY + " AND h.id <= ?"
+        values: List[Any] = [subscriber.position]
+        if subscriber.task_id is not None:
+            query += " AND h.task_id = ?"
+            values.append(subscriber.task_id)
+        if subscriber.core_group_id is not None:
+            query += " AND (t.CoreGroupID = ? OR t.TaskID IS NULL)"
+            values.append(subscriber.core_group_id)
+        query += " ORDER BY h.id LIMIT ?"
+        while after < subscriber.position:
+            rows = await read_connection().execute_query_dict(
+                query, [after] + values + [self.batch_size]
+            )
+            if not rows:
+                return
+            yield b"".join(encode_change(row).message for row in rows)
+            after = rows[-1]["id"]
+
+    async def stream(
+        self,
+        task_id: Optional[int] = None,
+        core_group_id: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        """Server-Sent Events of every matching change, optionally resuming after an id.
+
+        :param after: Last History id the client has seen
+        """
+        subscriber = await self.subscribe(task_id, core_group_id)
+        try:
+            yield b"retry: 1000\n\n"
+            if after is not None:
+                async for chunk in self.replay(subscriber, after):
+                    yield chunk
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscriber.queue.get(), CHANGES_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                messages = []
+                while change is not None:
+                    messages.append(change.message)
+                    if subscriber.queue.empty() or len(messages) >= self.batch_size:
+                        break
+                    change = subscriber.queue.get_nowait()
+                if messages:
+                    yield b"".join(messages)
+                if change is None or subscriber.closed and subscriber.queue.empty():
+                    return
+                if subscriber.evicted and subscriber.queue.empty():
+                    yield b'event: evicted\ndata: {"reason":"slow consumer"}\n\n'
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+
+change_feed = ChangeFeed(
+    poll_interval=CHANGES_POLL_INTERVAL,
+    buffer_size=CHANGES_BUFFER_SIZE,
+    batch_size=CHANGES_BATCH_SIZE,
+)
@@ -1,6 +1,22 @@
-import uvicorn
-from .const import HOST, PORT
+import logging
+import os
+from importlib.util import find_spec
 from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+from .const import (
+    CACHE_URL,
+    HOST,
+    PORT,
+    SERVER_BACKLOG,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_KEEP_ALIVE,
+    WEB_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def start():
@@ -18,3 +34,43 @@ def start():
         host=HOST,
         port=PORT,
     )
+
+
+def start_production(workers: Optional[int] = None):
+    """Starts the FastAPI application for production with several worker processes.
+
+    The database is migrated once here, before any worker starts, so workers
+    never run schema changes concurrently. Writes from all workers go
+    through `BEGIN IMMEDIATE` transactions on a WAL database and wait up to
+    `DB_BUSY_TIMEOUT` for the write lock, so they queue instead of
+    deadlocking. uvloop and httptools are used when installed.
+
+    On SIGTERM, workers stop accepting connections, finish in-flight
+    requests for up to `SERVER_GRACEFUL_TIMEOUT` seconds and flush their
+    queued webhook updates and History rows.
+
+    :param workers: Number of worker processes, defaults to `WEB_CONCURRENCY`
+    """
+    from .models.migrations import Migrate
+
+    workers = workers or WEB_CONCURRENCY
+    Migrate()
+    if workers > 1:
+        # Invalidations only reach the cache of the worker that wrote the
+        # task, so per-process caching is left off unless explicitly sized.
+        # A shared CACHE_URL backend keeps working across workers.
+        os.environ.setdefault("TASK_CACHE_SIZE", "0")
+        if not CACHE_URL:
+            logger.warning("Task cache disabled: set CACHE_URL to share it between workers")
+    uvicorn.run(
+        "app:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop="uvloop" if find_spec("uvloop") else "asyncio",
+        http="httptools" if find_spec("httptools") else "h11",
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEP_ALIVE,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+    )
@@ -2,3 +2,58 @@ import os
 
 HOST = os.environ.get("HOST", "0.0.0.0")
 PORT = int(os.environ.get("PORT", 8000))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+SERVER_BACKLOG = int(os.environ.get("SERVER_BACKLOG", 4096))
+SERVER_KEEP_ALIVE = int(os.environ.get("SERVER_KEEP_ALIVE", 30))
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", 30))
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", 500))
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+SEARCH_MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", 100))
+CACHE_URL = os.environ.get("CACHE_URL", "")
+TASK_CACHE_SIZE = int(os.environ.get("TASK_CACHE_SIZE", 4096))
+TASK_CACHE_TTL = float(os.environ.get("TASK_CACHE_TTL", 30))
+WEBHOOK_MODE = os.environ.get("WEBHOOK_MODE", "sync")
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", 10000))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", 1))
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", 200))
+HISTORY_DURABLE = os.environ.get("HISTORY_DURABLE", "0") == "1"
+HISTORY_BUFFER_SIZE = int(os.environ.get("HISTORY_BUFFER_SIZE", 500))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", 0.5))
+HISTORY_BUFFER_LIMIT = int(os.environ.get("HISTORY_BUFFER_LIMIT", 100000))
+DB_URL = os.environ.get("DB_URL", "sqlite://db.sqlite3")
+DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", 4))
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_CACHE_SIZE = int(os.environ.get("DB_CACHE_SIZE", -64 * 1024))
+DB_BUSY_TIMEOUT = int(os.environ.get("DB_BUSY_TIMEOUT", 5000))
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 10000))
+ENUM_STORAGE = os.environ.get("ENUM_STORAGE", "text")
+STATS_RECOMPUTE_INTERVAL = float(os.environ.get("STATS_RECOMPUTE_INTERVAL", 3600))
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "1") == "1"
+PLAYGROUND_DISPATCH = os.environ.get("PLAYGROUND_DISPATCH", "asgi")
+PLAYGROUND_URL = os.environ.get("PLAYGROUND_URL", "")
+PLAYGROUND_CONCURRENCY = int(os.environ.get("PLAYGROUND_CONCURRENCY", 50))
+PLAYGROUND_BATCH_LIMIT = int(os.environ.get("PLAYGROUND_BATCH_LIMIT", 10000))
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+ARCHIVE_BLOCK_SIZE = int(os.environ.get("ARCHIVE_BLOCK_SIZE", 5000))
+HISTORY_RETENTION_DAYS = float(os.environ.get("HISTORY_RETENTION_DAYS", 90))
+HISTORY_ARCHIVE_INTERVAL = float(os.environ.get("HISTORY_ARCHIVE_INTERVAL", 0))
+CHANGES_POLL_INTERVAL = float(os.environ.get("CHANGES_POLL_INTERVAL", 0.25))
+CHANGES_BUFFER_SIZE = int(os.environ.get("CHANGES_BUFFER_SIZE", 1000))
+CHANGES_BATCH_SIZE = int(os.environ.get("CHANGES_BATCH_SIZE", 500))
+CHANGES_HEARTBEAT = float(os.environ.get("CHANGES_HEARTBEAT", 15))
+ADMISSION_READ_CONCURRENCY = int(os.environ.get("ADMISSION_READ_CONCURRENCY", 64))
+ADMISSION_READ_QUEUE = int(os.environ.get("ADMISSION_READ_QUEUE", 512))
+ADMISSION_WRITE_CONCURRENCY = int(os.environ.get("ADMISSION_WRITE_CONCURRENCY", 8))
+ADMISSION_WRITE_QUEUE = int(os.environ.get("ADMISSION_WRITE_QUEUE", 256))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 5))
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+WEBHOOK_DEDUP_WINDOW = float(os.environ.get("WEBHOOK_DEDUP_WINDOW", 10))
+ADMISSION_EXEMPT = os.environ.get(
+    "ADMISSION_EXEMPT",
+    "/changes,/metrics,/admission,/webhook/status,/cache/stats,/histories/writer,"
+    "/idempotency/status,/webhook-playground,/docs,/redoc,/openapi.json",
+).split(",")
@@ -0,0 +1,205 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncContextManager, List, Optional
+
+from pydantic import BaseModel
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from .const import (
+    HISTORY_BUFFER_LIMIT,
+    HISTORY_BUFFER_SIZE,
+    HISTORY_DURABLE,
+    HISTORY_FLUSH_INTERVAL,
+)
+from .metrics import observe_history
+from .models.database import WRITER
+from .models.db_task import History
+from .models.enum import HistoryActionType
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriterStatus(BaseModel):
+    durable: bool
+    buffered: int
+    buffer_size: int
+    buffer_limit: int
+    flush_interval: float
+    flushes: int
+    written: int
+    failed: int
+    dropped: int
+    last_flush_latency: float
+    max_flush_latency: float
+    total_flush_latency: float
+    last_error: Optional[str] = None
+
+
+class HistoryWriter:
+    """Write-behind buffer for History audit rows.
+
+    Records are kept in memory and written with one `bulk_create` once
+    `buffer_size` records are waiting or `flush_interval` seconds passed,
+    which takes the audit insert off the critical path of every write.
+    In durable mode, or when a caller passes its transaction, the record
+    is written immediately in that transaction instead.
+
+    Records are stamped when they are recorded, not when they are flushed.
+    While flushes fail the records are kept for the next one, at most
+    `buffer_limit` of them; older records beyond that are dropped, counted
+    and logged, as are records a failed flush at shutdown leaves behind.
+    """
+
+    def __init__(
+        self, durable: bool, buffer_size: int, flush_interval: float, buffer_limit: int
+    ) -> None:
+        self.durable = durable
+        self.buffer_size = buffer_size
+        self.buffer_limit = max(buffer_limit, buffer_size)
+        self.flush_interval = flush_interval
+        self._buffer: List[History] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional["asyncio.Task[None]"] = None
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self._failing = False
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        self.last_error: Optional[str] = None
+
+    def transaction(self) -> AsyncContextManager[Optional[BaseDBAsyncClient]]:
+        """Opens the transaction a task change and its audit row share.
+
+        :return: A transaction in durable mode, otherwise a context yielding None
+        :rtype: AsyncContextManager[Optional[BaseDBAsyncClient]]
+        """
+        if self.durable:
+            return in_transaction(WRITER)
+        return contextlib.nullcontext()
+
+    async def record(
+        self,
+        task_id: int,
+        action: HistoryActionType,
+        description: str,
+        connection: Optional[BaseDBAsyncClient] = None,
+    ) -> None:
+        """Records an audit row for a change of `task_id`.
+
+        :param connection: Transaction of the task change; when given the
+            row is written right away as part of that transaction
+        """
+        history = History(
+            task_id=task_id,
+            action=action,
+            description=description,
+            time=datetime.now(timezone.utc),
+        )
+        if connection is not None or self.durable:
+            await history.save(using_db=connection)
+            self.written += 1
+            observe_history("direct")
+            return
+        self._buffer.append(history)
+        self._trim()
+        observe_history("buffered")
+        # After a failed flush the timer retries, not every new record.
+        if len(self._buffer) >= self.buffer_size and not self._failing:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Writes every buffered record with a single `bulk_create`."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            start = time.perf_counter()
+            try:
+                await History.bulk_create(records)
+            except Exception as e:
+                # Keep the records so the next flush retries them, up to
+                # the limit, so a database outage cannot exhaust memory.
+                self._buffer[:0] = records
+                self.failed += 1
+                self._failing = True
+                self.last_error = f"{e.__class__}:" + " ".join(i.__str__() for i in e.args)
+                self._trim()
+                logger.error(
+                    "History flush failed, %d records kept, %d dropped so far: %s",
+                    len(self._buffer),
+                    self.dropped,
+                    self.last_error,
+                )
+                return
+            latency = time.perf_counter() - start
+            self._failing = False
+            self.flushes += 1
+            self.written += len(records)
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            self.total_flush_latency += latency
+
+    def _trim(self) -> None:
+        """Drops the oldest records beyond `buffer_limit`."""
+        excess = len(self._buffer) - self.buffer_limit
+        if excess > 0:
+            del self._buffer[:excess]
+            self.dropped += excess
+
+    def status(self) -> HistoryWriterStatus:
+        return HistoryWriterStatus(
+            durable=self.durable,
+            buffered=len(self._buffer),
+            buffer_size=self.buffer_size,
+            buffer_limit=self.buffer_limit,
+            flush_interval=self.flush_interval,
+            flushes=self.flushes,
+            written=self.written,
+            failed=self.failed,
+            dropped=self.dropped,
+            last_flush_latency=self.last_flush_latency,
+            max_flush_latency=self.max_flush_latency,
+            total_flush_latency=self.total_flush_latency,
+            last_error=self.last_error,
+        )
+
+    async def start(self) -> None:
+        if not self.durable:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stops the flush timer and writes whatever is still buffered."""
+        if self._timer is not None:
+            # Cancel under the lock so an in-progress flush is never interrupted.
+            async with self._lock:
+                self._timer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._timer
+            self._timer = None
+        await self.flush()
+        if self._buffer:
+            self.dropped += len(self._buffer)
+            logger.error(
+                "Dropped %d History records at shutdown: %s", len(self._buffer), self.last_error
+            )
+            self._buffer = []
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+history_writer = HistoryWriter(
+    durable=HISTORY_DURABLE,
+    buffer_size=HISTORY_BUFFER_SIZE,
+    flush_interval=HISTORY_FLUSH_INTERVAL,
+    buffer_limit=HISTORY_BUFFER_LIMIT,
+)
@@ -0,0 +1,390 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .api.serialization import dumps, loads
+from .cache import (
+    MISSING,
+    CacheStats,
+    LRUCache,
+    SharedBackend,
+    backend_from_url,
+    task_cache,
+)
+from .const import CACHE_URL, IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL, WEBHOOK_DEDUP_WINDOW
+from .metrics import resolve_route
+
+# Endpoints whose POST requests accept an `Idempotency-Key` header.
+IDEMPOTENT_PATHS = {"/tasks-activity", "/tasks-activity/json", "/webhook"}
+MAX_KEY_LENGTH = 255
+# `off` opts a webhook out of the automatic deduplication, as the playground
+# does: it repeats payloads on purpose to load the write path.
+DEDUP_HEADER = "X-Webhook-Dedup"
+
+
+class IdempotencyStatus(BaseModel):
+    keys: int
+    webhooks: int
+    maxsize: int
+    ttl: float
+    webhook_window: float
+    stored: int
+    replayed: int
+    coalesced: int
+    conflicts: int
+    evictions: int
+    expirations: int
+    backend_errors: int
+
+
+class StoredResponse(BaseModel):
+    """Response of a request that took effect, replayed to its retries."""
+
+    fingerprint: str
+    status: int
+    body: str
+
+
+class IdempotencyStore:
+    """Bounded stores of responses by idempotency key and by webhook task.
+
+    Responses stay `ttl` seconds under their `Idempotency-Key`, and
+    `webhook_window` seconds as the last webhook applied to a task. Both
+    are kept in process and, with `CACHE_URL`, in the shared backend, so a
+    retry sent to another worker is replayed as well.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        webhook_window: float,
+        backend: Optional[SharedBackend] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.webhook_window = webhook_window
+        self.backend = backend
+        self._stats = {"key": CacheStats(maxsize=maxsize), "webhook": CacheStats(maxsize=maxsize)}
+        self._local: Dict[str, LRUCache[str, StoredResponse]] = {
+            "key": LRUCache(maxsize, ttl, self._stats["key"]),
+            "webhook": LRUCache(maxsize, webhook_window, self._stats["webhook"]),
+        }
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future[None]"] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+        self.backend_errors = 0
+
+    def status(self) -> IdempotencyStatus:
+        return IdempotencyStatus(
+            keys=len(self._local["key"]),
+            webhooks=len(self._local["webhook"]),
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+            webhook_window=self.webhook_window,
+            stored=self.stored,
+            replayed=self.replayed,
+            coalesced=self.coalesced,
+            conflicts=self.conflicts,
+            evictions=sum(stats.evictions for stats in self._stats.values()),
+            expirations=sum(stats.expirations for stats in self._stats.values()),
+            backend_errors=self.backend_errors,
+        )
+
+    async def claim(self, kind: str, key: str) -> None:
+        """Waits until no other request with `key` runs, then marks it running.
+
+        The waiting requests look the stored response up afterwards, so a
+        retry arriving during the first request is replayed too.
+        """
+        while (kind, key) in self._inflight:
+            self.coalesced += 1
+            await asyncio.shield(self._inflight[kind, key])
+        # No await between the check and the claim, so only one request runs.
+        self._inflight[kind, key] = asyncio.get_running_loop().create_future()
+
+    def release(self, kind: str, key: str) -> None:
+        self._inflight.pop((kind, key)).set_result(None)
+
+    async def get(self, kind: str, key: str) -> Optional[StoredResponse]:
+        """Returns the stored response of `key`.
+
+        :param kind: `key` for Idempotency-Key entries, `webhook` for task entries
+        :return: Stored response or None
+        :rtype: Optional[StoredResponse]
+        """
+        stored = self._local[kind].get(key)
+        if stored is not MISSING:
+            return stored
+        if self.backend is None:
+            return None
+        try:
+            raw = await self.backend.get(f"idempotency:{kind}:{key}")
+        except Exception:
+            self.backend_errors += 1
+            return None
+        if raw is None:
+            return None
+        stored = StoredResponse.model_validate_json(raw)
+        self._local[kind].set(key, stored)
+        return stored
+
+    async def forget_task(self, task_id: int, origin: str = "write") -> None:
+        """Drops the last webhook of a task once the task changed.
+
+        Otherwise a webhook A, an update B through another endpoint and a
+        repeated A would replay the first A and leave the task at B.
+        Webhooks are left to the middleware, which forgets the entry for
+        the ones it does not deduplicate; applying a queued webhook keeps
+        it, so a retry after the queue flushed is still replayed.
+
+        :param origin: `webhook` for changes applied from a webhook payload
+        """
+        if origin == "webhook":
+            return
+        key = str(task_id)
+        self._local["webhook"].delete(key)
+        if self.backend is not None:
+            try:
+                await self.backend.delete(f"idempotency:webhook:{key}")
+            except Exception:
+                self.backend_errors += 1
+
+    async def set(self, kind: str, key: str, stored: StoredResponse) -> None:
+        self.stored += 1
+        self._local[kind].set(key, stored)
+        if self.backend is not None:
+            try:
+                await self.backend.set(
+                    f"idempotency:{kind}:{key}",
+                    stored.model_dump_json().encode(),
+                    self.ttl if kind == "key" else self.webhook_window,
+                )
+            except Exception:
+                self.backend_errors += 1
+
+
+def replay_body(body: bytes, receive: Receive) -> Receive:
+    """Receive channel that returns the already read `body`, then the original channel."""
+    replayed = False
+
+    async def receive_body() -> Message:
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive_body
+
+
+def is_form(scope: Scope) -> bool:
+    content_type = dict(scope["headers"]).get(b"content-type", b"")
+    return content_type.startswith((b"multipart/form-data", b"application/x-www-form-urlencoded"))
+
+
+def decode_json(body: bytes) -> Any:
+    """Decoded JSON body, MISSING when it is not valid JSON."""
+    try:
+        return loads(body)
+    except ValueError:
+        return MISSING
+
+
+async def fingerprint(scope: Scope, body: bytes, receive: Receive, payload: Any) -> str:
+    """Hash of the fields of a request body, independent of how they were encoded.
+
+    Form bodies are compared by their fields, sorted, because every retry
+    of a multipart request has a new boundary; JSON bodies by their value
+    with sorted keys. Other bodies are compared byte for byte.
+
+    :param payload: Decoded JSON body, MISSING for other bodies
+    """
+    if is_form(scope):
+        form = await Request(scope, replay_body(body, receive)).form()
+        try:
+            fields = [
+                (name, value)
+                if isinstance(value, str)
+                else (name, value.filename, hashlib.sha256(await value.read()).hexdigest())
+                for name, value in form.multi_items()
+            ]
+        finally:
+            await form.close()
+        canonical = dumps(sorted(fields))
+    elif payload is not MISSING:
+        canonical = dumps(payload, sort_keys=True)
+    else:
+        canonical = body
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def webhook_task(payload: Any) -> Optional[int]:
+    """Task id of a decoded webhook payload, None when the payload has none."""
+    task_id = payload.get("task_id") if isinstance(payload, dict) else None
+    return task_id if isinstance(task_id, int) and not isinstance(task_id, bool) else None
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware that answers retried writes from stored responses.
+
+    A POST to one of `IDEMPOTENT_PATHS` with an `Idempotency-Key` header
+    runs once; later requests with the same key and fields get the stored
+    response with an `Idempotent-Replayed` header, without touching
+    `TasksActivity` or `History`, and the same key with other fields is
+    rejected with 422. Requests that arrive while the first one runs wait
+    for its response instead of running in parallel. Only successful
+    responses are stored: error statuses and responses whose endpoint set
+    `request.state.failed` run again on retry.
+
+    Webhooks without a key are deduplicated by task: a payload identical to
+    the last one applied to its task within `WEBHOOK_DEDUP_WINDOW` seconds
+    is replayed. Any other change to the task in between, by a webhook with
+    a key or with `X-Webhook-Dedup: off`, or by `PUT`, `DELETE` or the bulk
+    endpoints, forgets that payload, so A, B, A ends with A unless B runs
+    concurrently with the first A. Webhooks sent with `X-Webhook-Dedup: off`
+    are always applied.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in IDEMPOTENT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        header = headers.get(b"idempotency-key")
+        dedup = scope["path"] == "/webhook" and idempotency_store.webhook_window > 0
+        webhook = dedup and headers.get(DEDUP_HEADER.lower().encode()) != b"off"
+        if header is None and not dedup:
+            await self.app(scope, receive, send)
+            return
+        # Replays and rejections are answered here, before routing.
+        resolve_route(scope)
+        if header is not None and not 0 < len(header) <= MAX_KEY_LENGTH:
+            await self.respond(
+                send, 400, f"Idempotency-Key must have 1 to {MAX_KEY_LENGTH} characters"
+            )
+            return
+
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        receive_body = replay_body(body, receive)
+        payload = MISSING if is_form(scope) else decode_json(body)
+        # Shared with `request.state` of the endpoint.
+        state = scope.setdefault("state", {})
+        if payload is not MISSING:
+            # Handed to the endpoint, so the body is only decoded once.
+            state["payload"] = payload
+
+        task_id = webhook_task(payload) if dedup else None
+        # Webhooks applied without the per-task dedup replace its entry.
+        forget = task_id is not None and (header is not None or not webhook)
+        if header is not None:
+            kind, key = "key", f"{scope['path']}:{header.decode('latin-1')}"
+        elif task_id is None or not webhook:
+            if forget:
+                await idempotency_store.forget_task(task_id)
+            await self.app(scope, receive_body, send)
+            return
+        else:
+            kind, key = "webhook", str(task_id)
+        digest = await fingerprint(scope, body, receive, payload)
+
+        store = idempotency_store
+        await store.claim(kind, key)
+        try:
+            stored = await store.get(kind, key)
+            if stored is not None and stored.fingerprint == digest:
+                store.replayed += 1
+                await self.replay(send, stored)
+                return
+            if stored is not None and kind == "key":
+                store.conflicts += 1
+                await self.respond(send, 422, "Idempotency-Key was used with another request body")
+                return
+
+            status = 500
+            sent: List[bytes] = []
+
+            async def send_captured(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                elif message["type"] == "http.response.body":
+                    sent.append(message.get("body", b""))
+                await send(message)
+
+            if forget:
+                await store.forget_task(task_id)
+            await self.app(scope, receive_body, send_captured)
+            # Failed requests are not stored, so their retries run again.
+            if 200 <= status < 300 and not state.get("failed"):
+                await store.set(
+                    kind,
+                    key,
+                    StoredResponse(
+                        fingerprint=digest, status=status, body=b"".join(sent).decode()
+                    ),
+                )
+        finally:
+            store.release(kind, key)
+
+    @staticmethod
+    async def replay(send: Send, stored: StoredResponse) -> None:
+        body = stored.body.encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"idempotent-replayed", b"true"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def respond(send: Send, status: int, message: str) -> None:
+        body = dumps({"success": False, "message": message})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+idempotency_store = IdempotencyStore(
+    maxsize=IDEMPOTENCY_CACHE_SIZE,
+    ttl=IDEMPOTENCY_TTL,
+    webhook_window=WEBHOOK_DEDUP_WINDOW,
+    backend=backend_from_url(CACHE_URL),
+)
+# Every write path invalidates the cached task, so it forgets the webhook too.
+task_cache.listeners.append(idempotency_store.forget_task)
@@ -0,0 +1,376 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .const import METRICS_ENABLED, SERVER_TIMING
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (128, 1024, 8192, 65536, 524288, 4194304, 33554432)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 500)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    """Base of the metric types, keyed by a tuple of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ] + self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: Labels = (), value: float = 0) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: count of each bucket (non-cumulative, last one is
+        # +Inf), sum and count.
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labels, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format.
+
+    Metrics live in process memory and are updated without locks, which is
+    safe because they are only touched from the event loop thread.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], None]) -> Callable[[], None]:
+        """Registers a callback that refreshes gauges right before rendering."""
+        self.collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+REQUESTS_IN_FLIGHT: Gauge = registry.register(  # type: ignore
+    Gauge("http_requests_in_flight", "Requests being served")
+)
+REQUEST_DURATION: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the end of its response",
+        ("method", "route", "status"),
+    )
+)
+REQUEST_PHASE: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "http_request_phase_seconds",
+        "Time a request spent waiting for admission, in database queries and in response serialization",
+        ("route", "phase"),
+    )
+)
+REQUEST_QUERIES: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "http_request_db_queries", "Database queries per request", ("route",), COUNT_BUCKETS
+    )
+)
+REQUEST_HISTORY: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "http_request_history_records",
+        "History records written or buffered per request",
+        ("route",),
+        COUNT_BUCKETS,
+    )
+)
+REQUEST_SIZE: Histogram = registry.register(  # type: ignore
+    Histogram("http_request_size_bytes", "Request body size", ("route",), SIZE_BUCKETS)
+)
+RESPONSE_SIZE: Histogram = registry.register(  # type: ignore
+    Histogram("http_response_size_bytes", "Response body size", ("route",), SIZE_BUCKETS)
+)
+QUERY_DURATION: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "db_query_duration_seconds",
+        "Database statement time, including the wait for the connection",
+        ("operation", "connection"),
+    )
+)
+QUERY_ROWS: Counter = registry.register(  # type: ignore
+    Counter(
+        "db_rows_total",
+        "Rows returned by reads or changed by writes",
+        ("operation", "connection"),
+    )
+)
+HISTORY_RECORDS: Counter = registry.register(  # type: ignore
+    Counter("history_records_total", "History records by write path", ("mode",))
+)
+ADMISSION_WAIT: Histogram = registry.register(  # type: ignore
+    Histogram(
+        "admission_wait_seconds",
+        "Time admitted requests waited for a slot of their route group",
+        ("group",),
+    )
+)
+ADMISSION_REJECTED: Counter = registry.register(  # type: ignore
+    Counter(
+        "admission_rejected_total",
+        "Requests rejected because their group queue was full or the wait timed out",
+        ("group", "reason"),
+    )
+)
+
+
+class RequestMetrics:
+    """Time and work attributed to the request being served."""
+
+    __slots__ = ("queue_time", "db_time", "queries", "serialize_time", "history")
+
+    def __init__(self) -> None:
+        self.queue_time = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.serialize_time = 0.0
+        self.history = 0
+
+
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_request", default=None
+)
+
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COMMIT"}
+
+
+def observe_query(query: str, connection: str, seconds: float, rows: int) -> None:
+    """Records one database statement.
+
+    :param query: SQL statement, only its first keyword is used as label
+    :param connection: `reader` or `writer`
+    :param seconds: Statement time
+    :param rows: Rows returned or changed
+    """
+    if not METRICS_ENABLED:
+        return
+    operation = query.lstrip()[:6].upper()
+    labels = (operation if operation in OPERATIONS else "OTHER", connection)
+    QUERY_DURATION.observe(labels, seconds)
+    if rows:
+        QUERY_ROWS.inc(labels, rows)
+    request = current_request.get()
+    if request is not None:
+        request.db_time += seconds
+        request.queries += 1
+
+
+def observe_serialization(seconds: float) -> None:
+    request = current_request.get()
+    if request is not None:
+        request.serialize_time += seconds
+
+
+def observe_history(mode: str, records: int = 1) -> None:
+    """Counts History records written by `mode`: direct, buffered, bulk or queue."""
+    if not METRICS_ENABLED:
+        return
+    HISTORY_RECORDS.inc((mode,), records)
+    request = current_request.get()
+    if request is not None:
+        request.history += records
+
+
+def observe_admission(group: str, seconds: float, rejected: Optional[str] = None) -> None:
+    """Records the wait of a request for a slot of its route group.
+
+    :param group: `read` or `write`
+    :param seconds: Time spent in the queue
+    :param rejected: Reason the request was turned away, None when admitted
+    """
+    if not METRICS_ENABLED:
+        return
+    if rejected is not None:
+        ADMISSION_REJECTED.inc((group, rejected))
+        return
+    ADMISSION_WAIT.observe((group,), seconds)
+    request = current_request.get()
+    if request is not None:
+        request.queue_time += seconds
+
+
+def resolve_route(scope: Scope) -> None:
+    """Sets `scope["route"]` for a response sent before routing.
+
+    Middlewares that answer on their own, such as admission rejections,
+    call it first, so the response is labelled with its route template
+    instead of `unmatched`.
+    """
+    if "route" in scope or "app" not in scope:
+        return
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            scope["route"] = route
+            return
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    if partial is not None:
+        scope["route"] = partial
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records latency, sizes and per-request work.
+
+    Routes are labelled by their path template, so `/task/1` and `/task/2`
+    share one series. With `SERVER_TIMING` enabled, every response carries
+    a `Server-Timing` header with its admission wait, database and
+    serialization time.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics()
+        token = current_request.set(request)
+        started = time.perf_counter()
+        received = 0
+        sent = 0
+        status = 500
+
+        async def receive_counted() -> Message:
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message: Message) -> None:
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", self.server_timing(request, started).encode())
+                    ]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            REQUESTS_IN_FLIGHT.inc(amount=-1)
+            current_request.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_DURATION.observe(
+                (scope["method"], path, str(status)), time.perf_counter() - started
+            )
+            REQUEST_PHASE.observe((path, "queue"), request.queue_time)
+            REQUEST_PHASE.observe((path, "db"), request.db_time)
+            REQUEST_PHASE.observe((path, "serialize"), request.serialize_time)
+            REQUEST_QUERIES.observe((path,), request.queries)
+            REQUEST_HISTORY.observe((path,), request.history)
+            REQUEST_SIZE.observe((path,), received)
+            RESPONSE_SIZE.observe((path,), sent)
+
+    @staticmethod
+    def server_timing(request: RequestMetrics, started: float) -> str:
+        total = (time.perf_counter() - started) * 1000
+        return (
+            f"queue;dur={request.queue_time * 1000:.2f}, "
+            f'db;dur={request.db_time * 1000:.2f};desc="{request.queries} queries", '
+            f"serialize;dur={request.serialize_time * 1000:.2f}, "
+            f"total;dur={total:.2f}"
+        )
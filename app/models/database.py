@@ -0,0 +1,85 @@
+from itertools import cycle
+from typing import Any, Dict, List, Optional, Type
+
+from tortoise import Model, connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.backends.base.config_generator import expand_db_url
+
+from ..const import (
+    DB_BUSY_TIMEOUT,
+    DB_CACHE_SIZE,
+    DB_MMAP_SIZE,
+    DB_READ_POOL_SIZE,
+    DB_SYNCHRONOUS,
+    DB_URL,
+)
+
+MODELS = ["app.models.db_task"]
+
+WRITER = "default"
+
+READERS = [f"reader_{i}" for i in range(DB_READ_POOL_SIZE)]
+
+
+class ReadPoolRouter:
+    """Sends reads to the pool of read-only connections, round-robin.
+
+    Writes always go to the single writer connection, which serializes
+    them. Queries that must see uncommitted writes pass their transaction
+    with `using_db` and bypass the router.
+    """
+
+    readers = cycle(READERS) if READERS else None
+
+    def db_for_read(self, model: Type[Model]) -> Optional[str]:
+        return next(self.readers) if self.readers else None
+
+    def db_for_write(self, model: Type[Model]) -> Optional[str]:
+        return WRITER
+
+
+def read_connection() -> BaseDBAsyncClient:
+    """Returns the connection raw read queries should run on.
+
+    :return: Next reader of the pool, or the writer without a pool
+    :rtype: BaseDBAsyncClient
+    """
+    return connections.get(ReadPoolRouter().db_for_read(Model) or WRITER)
+
+
+def tortoise_config(readers: bool = True) -> Dict[str, Any]:
+    """Builds the Tortoise ORM configuration from `DB_URL`.
+
+    For SQLite databases the writer enables WAL with the tuned pragmas and,
+    when `readers` is set, `DB_READ_POOL_SIZE` read-only connections are
+    added next to it.
+
+    :param readers: Whether to configure the pool of read-only connections
+    :return: Tortoise ORM configuration
+    :rtype: Dict[str, Any]
+    """
+    writer = expand_db_url(DB_URL)
+    connections: Dict[str, Any] = {WRITER: writer}
+    routers: List[str] = []
+    if writer["engine"] == "tortoise.backends.sqlite":
+        writer["engine"] = "app.models.sqlite"
+        writer["credentials"].update(
+            journal_mode="WAL",
+            synchronous=DB_SYNCHRONOUS,
+            mmap_size=DB_MMAP_SIZE,
+            cache_size=DB_CACHE_SIZE,
+            busy_timeout=DB_BUSY_TIMEOUT,
+            temp_store="MEMORY",
+        )
+        if readers and READERS:
+            for name in READERS:
+                connections[name] = {
+                    "engine": writer["engine"],
+                    "credentials": dict(writer["credentials"], read_only=True),
+                }
+            routers.append("app.models.database.ReadPoolRouter")
+    return {
+        "connections": connections,
+        "apps": {"models": {"models": MODELS, "default_connection": WRITER}},
+        "routers": routers,
+    }
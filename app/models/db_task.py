@@ -1,4 +1,5 @@
-from tortoise import Model, Tortoise, fields, run_async
+from tortoise import Model, Tortoise, connections, fields, run_async
+from .database import WRITER, tortoise_config
 from .enum import (
     ActivityName,
     GroupCategory,
@@ -8,39 +9,49 @@ from .enum import (
     SubCategoryName,
     Status,
 )
+from .fields import EnumCodeField
+from .migrations import database_path, migrate
+from .search import rebuild_search_index
 from .task import HistoryModel, TasksActivityModel
 
 
 class TasksActivity(Model):
     class Meta:  # type: ignore
         table = "TasksActivity"
+        indexes = (
+            ("status", "due_date"),
+            ("stage_name", "due_date"),
+            ("activity_type_name", "due_date"),
+            ("assign_to_email", "status", "due_date"),
+            ("core_group_id", "status", "due_date"),
+        )
 
     task_id = fields.IntField(primary_key=True, source_field="TaskID")
     task_name = fields.TextField(source_field="TaskName")
     task_description = fields.TextField(source_field="TaskDescription")
     activity_type_id = fields.IntField(source_field="ActivityTypeID")
-    activity_type_name = fields.CharEnumField(
+    activity_type_name = EnumCodeField(
         ActivityName, source_field="ActivityTypeName"
     )
     activity_group_sub_category_id = fields.IntField(
         source_field="ActivityGroupSubCategoryId"
     )
-    activity_group_sub_category_name = fields.CharEnumField(
+    activity_group_sub_category_name = EnumCodeField(
         SubCategoryName, source_field="ActivityGroupSubCategoryName"
     )
     activity_group_id = fields.IntField(source_field="ActivityGroupID")
-    activity_group_name = fields.CharEnumField(
+    activity_group_name = EnumCodeField(
         GroupName, source_field="ActivityGroupName"
     )
     stage_id = fields.IntField(source_field="StageID")
-    stage_name = fields.CharEnumField(StageName, source_field="StageName")
+    stage_name = EnumCodeField(StageName, source_field="StageName")
     core_group_category_id = fields.IntField(source_field="CoreGroupCategoryID")
-    core_group_category = fields.CharEnumField(
+    core_group_category = EnumCodeField(
         GroupCategory, source_field="CoreGroupCategory"
     )
     core_group_id = fields.IntField(source_field="CoreGroupID")
     core_group_name = fields.TextField(source_field="CoreGroupName")
-    due_date = fields.DateField(source_field="DueDate")
+    due_date = fields.DateField(source_field="DueDate", index=True)
     action_type = fields.CharField(max_length=255, source_field="ActionType")
     related_to = fields.CharField(max_length=255, source_field="RelatedTo")
     related_to_picture_id = fields.IntField(source_field="RelatedToPictureID")
@@ -53,13 +64,15 @@ class TasksActivity(Model):
     assign_to_email = fields.CharField(max_length=255, source_field="AssignToEmail")
     assign_to_company = fields.CharField(max_length=255, source_field="AssignToCompany")
     notes = fields.TextField(source_field="Notes")
-    status = fields.CharEnumField(Status, source_field="Status")
+    status = EnumCodeField(Status, source_field="Status")
     attachment_id = fields.IntField(source_field="AttachmentID")
     attachments = fields.CharField(max_length=255, source_field="Attachments")
     link_object_id = fields.IntField(source_field="LinkObjectID")
     link_response_id = fields.IntField(source_field="LinkResponseID")
     created_by = fields.CharField(max_length=255, source_field="CreatedBy")
-    created_on = fields.DatetimeField(auto_now=True, source_field="CreatedOn")
+    created_on = fields.DatetimeField(
+        auto_now=True, source_field="CreatedOn", index=True
+    )
 
     def to_model(self) -> TasksActivityModel:
         """Converts TasksActivity instance to TasksActivityModel.
@@ -107,12 +120,14 @@ class TasksActivity(Model):
 class History(Model):
     class Meta:  # type: ignore
         table = "History"
+        indexes = (("task_id", "time"),)
 
     id = fields.IntField(primary_key=True)
     task_id = fields.IntField()
     action = fields.CharEnumField(HistoryActionType)
     description = fields.TextField()
-    time = fields.DatetimeField(auto_now=True)
+    # Set once on insert; the write-behind buffer passes the time of the event.
+    time = fields.DatetimeField(auto_now_add=True, index=True)
 
     def to_model(self) -> HistoryModel:
         """Converts History instance to HistoryModel.
@@ -132,18 +147,32 @@ class History(Model):
 async def InitializeDB():
     """Initialize Tortoise ORM.
 
-    This function initializes Tortoise ORM with SQLite database connection
-    and generates schemas based on specified models.
+    This function applies the pending migrations of the SQLite database
+    configured by `DB_URL` and initializes Tortoise ORM with it. Other
+    databases get their tables generated from the models.
 
     :return: None
     """
-    await Tortoise.init(
-        db_url="sqlite://db.sqlite3",
-        modules={"models": ["app.models.db_task"]},
-        routers=[],
-    )
-    await Tortoise.generate_schemas()
+    path = database_path()
+    if path is not None:
+        migrate(path)
+    await Tortoise.init(config=tortoise_config(readers=False))
+    if path is None:
+        await Tortoise.generate_schemas()
 
 
 def Initialize():
     run_async(InitializeDB())
+
+
+async def ReindexDB():
+    """Rebuild the full-text search index from the `TasksActivity` table.
+
+    :return: None
+    """
+    await Tortoise.init(config=tortoise_config(readers=False))
+    await rebuild_search_index(connections.get(WRITER))
+
+
+def Reindex():
+    run_async(ReindexDB())
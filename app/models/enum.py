@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Dict, Type
 
 
 class ActivityName(Enum):
@@ -57,3 +58,15 @@ class HistoryActionType(Enum):
     CREATE = "create"
     UPDATE = "update"
     DELETE = "delete"
+
+
+def enum_codes(enum_type: Type[Enum]) -> Dict[Enum, str]:
+    """Storage codes of an enum: the 1-based position of each member.
+
+    Codes are stored in place of the values with `ENUM_STORAGE=code`, so
+    new members must be appended and existing ones never reordered.
+
+    :return: Code of every member
+    :rtype: Dict[Enum, str]
+    """
+    return {member: str(position) for position, member in enumerate(enum_type, 1)}
@@ -0,0 +1,61 @@
+from enum import Enum
+from typing import Any, Dict, Optional, Type, Union
+
+from tortoise.fields.data import CharEnumFieldInstance, CharEnumType
+
+from ..const import ENUM_STORAGE
+from .enum import enum_codes
+
+if ENUM_STORAGE not in ("text", "code"):
+    raise ValueError(f"Unsupported ENUM_STORAGE: {ENUM_STORAGE}")
+
+
+class EnumCodeFieldInstance(CharEnumFieldInstance):
+    """Enum column stored either as the enum value or as a short code.
+
+    With `ENUM_STORAGE=code` writes store the member's code from
+    `enum_codes` ("1", "2", ...) instead of its text. Reads accept both
+    forms, so a table keeps working while its rows are converted.
+    """
+
+    def __init__(
+        self,
+        enum_type: Type[Enum],
+        description: Optional[str] = None,
+        max_length: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(enum_type, description, max_length, **kwargs)
+        self.codes = enum_codes(enum_type)
+        self.members: Dict[str, Enum] = {str(member.value): member for member in enum_type}
+        self.members.update({code: member for member, code in self.codes.items()})
+        # Enum value of every stored form, used to decode raw rows.
+        self.decoded: Dict[str, Any] = {
+            stored: member.value for stored, member in self.members.items()
+        }
+
+    def to_python_value(self, value: Union[Enum, str, None]) -> Union[Enum, None]:
+        if value is None or isinstance(value, self.enum_type):
+            return value
+        member = self.members.get(str(value))
+        if member is None:
+            raise ValueError(f"{value!r} is not a valid {self.enum_type.__name__}")
+        return member
+
+    def to_db_value(
+        self, value: Union[Enum, str, None], instance: Any
+    ) -> Union[str, None]:
+        member = self.to_python_value(value)
+        if member is None:
+            return None
+        return self.codes[member] if ENUM_STORAGE == "code" else str(member.value)
+
+
+def EnumCodeField(
+    enum_type: Type[CharEnumType],
+    description: Optional[str] = None,
+    max_length: int = 0,
+    **kwargs: Any,
+) -> CharEnumType:
+    """Drop-in `CharEnumField` honouring `ENUM_STORAGE`."""
+    return EnumCodeFieldInstance(enum_type, description, max_length, **kwargs)  # type: ignore
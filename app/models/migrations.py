@@ -0,0 +1,407 @@
+"""Versioned schema migrations of the SQLite database.
+
+The number of applied migrations is kept in the database header
+(`PRAGMA user_version`), so checking an up-to-date database is a single
+read that needs neither Tortoise nor the SQL of the migrations. Migrations
+are applied in order and never edited once released: a schema change is a
+new migration appended to `MIGRATIONS`, and the models in `db_task` are
+updated to match.
+
+Every step is idempotent, so a migration interrupted halfway is simply
+applied again. Index builds run one per transaction and table backfills
+run in batches of `MIGRATION_BATCH_SIZE` rows, so the write lock is only
+held briefly and a running application keeps serving writes in between.
+"""
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence
+
+from ..const import DB_BUSY_TIMEOUT, DB_URL, ENUM_STORAGE, MIGRATION_BATCH_SIZE
+
+
+class Migration(NamedTuple):
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def database_path(url: str = DB_URL) -> Optional[str]:
+    """Extracts the file of a `sqlite://` database URL.
+
+    :return: Database file, or None for other databases and in-memory SQLite
+    :rtype: Optional[str]
+    """
+    if not url.startswith("sqlite://"):
+        return None
+    path = url[len("sqlite://"):].split("?", 1)[0]
+    return None if path in ("", ":memory:") else path
+
+
+@contextmanager
+def transaction(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Runs a block in a `BEGIN IMMEDIATE` transaction of an autocommit connection."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def statements(*sql: str) -> Callable[[sqlite3.Connection], None]:
+    """Migration running each statement in its own transaction."""
+
+    def apply(connection: sqlite3.Connection) -> None:
+        for statement in sql:
+            with transaction(connection):
+                connection.execute(statement)
+
+    return apply
+
+
+def run_script(connection: sqlite3.Connection, sql: str) -> None:
+    """Runs a multi-statement script in one transaction.
+
+    :param connection: Autocommit connection
+    :param sql: Statements separated by semicolons
+    """
+    with transaction(connection):
+        for statement in split_script(sql):
+            connection.execute(statement)
+
+
+def split_script(sql: str) -> List[str]:
+    """Splits a script into complete statements, keeping trigger bodies whole."""
+    result = []
+    current = ""
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            result.append(current.strip())
+            current = ""
+    if current.strip():
+        result.append(current.strip())
+    return result
+
+
+def fill_in_batches(connection: sqlite3.Connection, insert: str, upper: Optional[int]) -> None:
+    """Runs `insert` over consecutive `TaskID` ranges up to `upper`.
+
+    :param connection: Autocommit connection
+    :param insert: Statement taking the exclusive lower and inclusive upper id of a batch
+    :param upper: Last id to process; later tasks are handled by the triggers or the application
+    """
+    lower = 0
+    while upper is not None and lower < upper:
+        with transaction(connection):
+            (last,) = connection.execute(
+                'SELECT MAX(TaskID) FROM (SELECT TaskID FROM "TasksActivity" '
+                "WHERE TaskID > ? AND TaskID <= ? ORDER BY TaskID LIMIT ?)",
+                (lower, upper, MIGRATION_BATCH_SIZE),
+            ).fetchone()
+            if last is None:
+                return
+            connection.execute(insert, (lower, last))
+        lower = last
+
+
+def has_column(connection: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in connection.execute(f'PRAGMA table_info("{table}")'))
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[[sqlite3.Connection], None]:
+    """Migration adding a column unless it already exists."""
+
+    def apply(connection: sqlite3.Connection) -> None:
+        with transaction(connection):
+            if not has_column(connection, table, column):
+                connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+
+    return apply
+
+
+def create_tables(connection: sqlite3.Connection) -> None:
+    run_script(
+        connection,
+        """
+        CREATE TABLE IF NOT EXISTS "History" (
+            "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            "task_id" INT NOT NULL,
+            "action" VARCHAR(6) NOT NULL,
+            "description" TEXT NOT NULL,
+            "time" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS "TasksActivity" (
+            "TaskID" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            "TaskName" TEXT NOT NULL,
+            "TaskDescription" TEXT NOT NULL,
+            "ActivityTypeID" INT NOT NULL,
+            "ActivityTypeName" VARCHAR(8) NOT NULL,
+            "ActivityGroupSubCategoryId" INT NOT NULL,
+            "ActivityGroupSubCategoryName" VARCHAR(17) NOT NULL,
+            "ActivityGroupID" INT NOT NULL,
+            "ActivityGroupName" VARCHAR(16) NOT NULL,
+            "StageID" INT NOT NULL,
+            "StageName" VARCHAR(17) NOT NULL,
+            "CoreGroupCategoryID" INT NOT NULL,
+            "CoreGroupCategory" VARCHAR(11) NOT NULL,
+            "CoreGroupID" INT NOT NULL,
+            "CoreGroupName" TEXT NOT NULL,
+            "DueDate" DATE NOT NULL,
+            "ActionType" VARCHAR(255) NOT NULL,
+            "RelatedTo" VARCHAR(255) NOT NULL,
+            "RelatedToPictureID" INT NOT NULL,
+            "RelatedToEmail" VARCHAR(255) NOT NULL,
+            "RelatedToCompany" VARCHAR(255) NOT NULL,
+            "AssignTo" VARCHAR(255) NOT NULL,
+            "AssignToPictureID" INT NOT NULL,
+            "AssignToEmail" VARCHAR(255) NOT NULL,
+            "AssignToCompany" VARCHAR(255) NOT NULL,
+            "Notes" TEXT NOT NULL,
+            "Status" VARCHAR(11) NOT NULL,
+            "AttachmentID" INT NOT NULL,
+            "Attachments" VARCHAR(255) NOT NULL,
+            "LinkObjectID" INT NOT NULL,
+            "LinkResponseID" INT NOT NULL,
+            "CreatedBy" VARCHAR(255) NOT NULL,
+            "CreatedOn" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+    )
+
+
+def last_task(connection: sqlite3.Connection) -> Optional[int]:
+    return connection.execute('SELECT MAX(TaskID) FROM "TasksActivity"').fetchone()[0]
+
+
+def create_search_index(connection: sqlite3.Connection) -> None:
+    from .search import FILL_SEARCH, SEARCH_RANK, SEARCH_SCHEMA, SEARCH_TABLE
+
+    # The triggers index every task written from here on, and the tasks
+    # that already exist are indexed in batches afterwards. Starting from
+    # an empty index keeps a repeated run from indexing a task twice.
+    with transaction(connection):
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+        ).fetchone()
+        if exists:
+            connection.execute(
+                f"INSERT INTO \"{SEARCH_TABLE}\"(\"{SEARCH_TABLE}\") VALUES ('delete-all')"
+            )
+        for statement in split_script(SEARCH_SCHEMA):
+            connection.execute(statement)
+        connection.execute(SEARCH_RANK)
+        upper = last_task(connection)
+    fill_in_batches(connection, FILL_SEARCH, upper)
+
+
+def create_stats_tables(connection: sqlite3.Connection) -> None:
+    from .stats import FILL_HISTORY, RECOMPUTE_TASKS, STATS_SCHEMA
+
+    # Counters are filled in the transaction that creates their triggers,
+    # so no write is counted twice or missed.
+    with transaction(connection):
+        for statement in split_script(STATS_SCHEMA):
+            connection.execute(statement)
+        for statement in RECOMPUTE_TASKS:
+            connection.execute(statement)
+        connection.execute('DELETE FROM "HistoryDailyCounter"')
+        connection.execute(FILL_HISTORY)
+
+
+def create_revision_tables(connection: sqlite3.Connection) -> None:
+    from .revision import FILL_REVISION, INITIAL_REVISION, REVISION_SCHEMA
+
+    with transaction(connection):
+        for statement in split_script(REVISION_SCHEMA):
+            connection.execute(statement)
+        connection.execute(INITIAL_REVISION)
+        upper = last_task(connection)
+    # Rows stamped by the triggers meanwhile are kept by INSERT OR IGNORE.
+    fill_in_batches(connection, FILL_REVISION, upper)
+
+
+MIGRATIONS: Sequence[Migration] = (
+    Migration("Create the TasksActivity and History tables", create_tables),
+    Migration(
+        "Index the TasksActivity pagination and filter columns",
+        statements(
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_DueDate_312814" '
+            'ON "TasksActivity" ("DueDate")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_Created_66cdad" '
+            'ON "TasksActivity" ("CreatedOn")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_Status_b00aa3" '
+            'ON "TasksActivity" ("Status", "DueDate")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_StageNa_fa32fd" '
+            'ON "TasksActivity" ("StageName", "DueDate")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_Activit_ec8f05" '
+            'ON "TasksActivity" ("ActivityTypeName", "DueDate")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_AssignT_3cdccf" '
+            'ON "TasksActivity" ("AssignToEmail", "Status", "DueDate")',
+            'CREATE INDEX IF NOT EXISTS "idx_TasksActivi_CoreGro_594db6" '
+            'ON "TasksActivity" ("CoreGroupID", "Status", "DueDate")',
+        ),
+    ),
+    Migration(
+        "Index History by time",
+        statements('CREATE INDEX IF NOT EXISTS "idx_History_time_9ed0b5" ON "History" ("time")'),
+    ),
+    Migration("Create the full-text search index", create_search_index),
+    Migration("Create the aggregate counter tables", create_stats_tables),
+    Migration("Create the revision tables", create_revision_tables),
+    Migration(
+        "Index History by task and time",
+        statements(
+            'CREATE INDEX IF NOT EXISTS "idx_History_task_id_9dabfc" '
+            'ON "History" ("task_id", "time")'
+        ),
+    ),
+    Migration(
+        "Create the settings table",
+        statements(
+            'CREATE TABLE IF NOT EXISTS "Setting" ('
+            "name TEXT NOT NULL PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID",
+            'INSERT OR IGNORE INTO "Setting"(name, value) VALUES (\'enum_storage\', \'text\')',
+        ),
+    ),
+)
+
+
+def enum_conversion(storage: str) -> str:
+    """Builds the UPDATE rewriting the enum columns of an id range into `storage` form.
+
+    Only rows holding at least one value in the other form are touched, so
+    rows already written in the target form do not fire the triggers.
+    """
+    from .enum import (
+        ActivityName,
+        GroupCategory,
+        GroupName,
+        StageName,
+        Status,
+        SubCategoryName,
+        enum_codes,
+    )
+
+    columns = {
+        "ActivityTypeName": ActivityName,
+        "ActivityGroupSubCategoryName": SubCategoryName,
+        "ActivityGroupName": GroupName,
+        "StageName": StageName,
+        "CoreGroupCategory": GroupCategory,
+        "Status": Status,
+    }
+    assignments = []
+    conditions = []
+    for column, enum_type in columns.items():
+        pairs = [
+            (str(member.value), code) if storage == "code" else (code, str(member.value))
+            for member, code in enum_codes(enum_type).items()
+        ]
+        cases = " ".join(f"WHEN '{old}' THEN '{new}'" for old, new in pairs)
+        olds = ", ".join(f"'{old}'" for old, _ in pairs)
+        assignments.append(f'"{column}" = CASE "{column}" {cases} ELSE "{column}" END')
+        conditions.append(f'"{column}" IN ({olds})')
+    return (
+        f'UPDATE "TasksActivity" SET {", ".join(assignments)} '
+        f"WHERE TaskID > ? AND TaskID <= ? AND ({' OR '.join(conditions)})"
+    )
+
+
+def convert_enum_storage(
+    connection: sqlite3.Connection, storage: str, report: Callable[[str], None]
+) -> bool:
+    """Rewrites the enum columns of `TasksActivity` as values or codes.
+
+    The stored form is recorded in the `Setting` table, so a database
+    already in `storage` form costs one lookup. Rows are converted in
+    batches; the triggers keep the stats counters in step, and reads accept
+    both forms meanwhile. Application processes should run with the new
+    `ENUM_STORAGE` before the conversion starts, since rows they write in
+    the old form afterwards are not converted.
+
+    :param connection: Autocommit connection
+    :param storage: `text` or `code`
+    :param report: Called with a line when the table was converted
+    :return: Whether rows were converted
+    :rtype: bool
+    """
+    if storage not in ("text", "code"):
+        raise ValueError(f"Unsupported ENUM_STORAGE: {storage}")
+    (current,) = connection.execute(
+        'SELECT value FROM "Setting" WHERE name = \'enum_storage\''
+    ).fetchone()
+    if current == storage:
+        return False
+    with transaction(connection):
+        upper = last_task(connection)
+    fill_in_batches(connection, enum_conversion(storage), upper)
+    with transaction(connection):
+        connection.execute(
+            'UPDATE "Setting" SET value = ? WHERE name = \'enum_storage\'', (storage,)
+        )
+    report(f"Converted enum columns to {storage} storage")
+    return True
+
+
+def connect(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT / 1000, isolation_level=None)
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path: str, report: Callable[[str], None] = lambda message: None) -> List[int]:
+    """Applies the migrations a database is missing.
+
+    Also converts the enum columns when `ENUM_STORAGE` changed. An
+    up-to-date database only costs opening the file and two reads. Each
+    migration is recorded right after it completes, so an interrupted run
+    resumes from the first migration not recorded.
+
+    :param path: SQLite database file, created if missing
+    :param report: Called with a line for every applied migration and for
+        an enum conversion
+    :return: Numbers of the applied migrations
+    :rtype: List[int]
+    """
+    connection = connect(path)
+    try:
+        version = schema_version(connection)
+        applied = []
+        if version < len(MIGRATIONS):
+            connection.execute("PRAGMA journal_mode=WAL")
+        for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+            migration.apply(connection)
+            connection.execute(f"PRAGMA user_version = {number}")
+            report(f"{number}: {migration.description}")
+            applied.append(number)
+        convert_enum_storage(connection, ENUM_STORAGE, report)
+        return applied
+    finally:
+        connection.close()
+
+
+def Migrate() -> None:
+    """Brings the database of `DB_URL` up to date.
+
+    Databases other than SQLite files have no migrations and get their
+    tables from the models instead.
+    """
+    path = database_path()
+    if path is None:
+        from .db_task import Initialize
+
+        Initialize()
+        return
+    # Applied migrations and an enum conversion are both reported.
+    reported: List[str] = []
+
+    def report(message: str) -> None:
+        reported.append(message)
+        print(message)
+
+    migrate(path, report)
+    if not reported:
+        print(f"Database schema is up to date (version {len(MIGRATIONS)})")
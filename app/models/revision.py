@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+TASKS = "TasksActivity"
+
+NOW = "strftime('%Y-%m-%d %H:%M:%f+00:00', 'now')"
+
+# Every write to TasksActivity bumps one table-wide version, and the row it
+# touched takes that version, so a task deleted and created again with the
+# same id never reuses a version.
+_BUMP = (
+    f'INSERT INTO "Revision"(name, version, modified) VALUES (\'{TASKS}\', 1, {NOW}) '
+    "ON CONFLICT(name) DO UPDATE SET version = version + 1, modified = excluded.modified;"
+)
+_STAMP = (
+    'INSERT INTO "TaskRevision"(task_id, version, modified) '
+    f'SELECT new.TaskID, version, modified FROM "Revision" WHERE name = \'{TASKS}\' '
+    "ON CONFLICT(task_id) DO UPDATE SET version = excluded.version, modified = excluded.modified;"
+)
+
+REVISION_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS "Revision" (
+    name TEXT NOT NULL PRIMARY KEY,
+    version INT NOT NULL,
+    modified TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS "TaskRevision" (
+    task_id INT NOT NULL PRIMARY KEY,
+    version INT NOT NULL,
+    modified TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS "Revision_insert" AFTER INSERT ON "TasksActivity" BEGIN
+    {_BUMP}
+    {_STAMP}
+END;
+CREATE TRIGGER IF NOT EXISTS "Revision_update" AFTER UPDATE ON "TasksActivity" BEGIN
+    {_BUMP}
+    {_STAMP}
+END;
+CREATE TRIGGER IF NOT EXISTS "Revision_delete" AFTER DELETE ON "TasksActivity" BEGIN
+    {_BUMP}
+    DELETE FROM "TaskRevision" WHERE task_id = old.TaskID;
+END;
+"""
+
+# Tasks that exist when the tables are created start at version 1, last
+# modified when they were created.
+INITIAL_REVISION = (
+    f'INSERT OR IGNORE INTO "Revision"(name, version, modified) VALUES (\'{TASKS}\', 1, {NOW})'
+)
+FILL_REVISION = (
+    'INSERT OR IGNORE INTO "TaskRevision"(task_id, version, modified) '
+    'SELECT TaskID, 1, CreatedOn FROM "TasksActivity" WHERE TaskID > ? AND TaskID <= ?'
+)
+
+Revision = Tuple[int, datetime]
+
+
+def _revision(rows) -> Optional[Revision]:
+    if not rows:
+        return None
+    return rows[0]["version"], datetime.fromisoformat(rows[0]["modified"])
+
+
+async def read_revision(connection: BaseDBAsyncClient) -> Optional[Revision]:
+    """Reads the version of the whole `TasksActivity` table.
+
+    :return: Version and time of the last write, or None before any write
+    :rtype: Optional[Revision]
+    """
+    return _revision(
+        await connection.execute_query_dict(
+            'SELECT version, modified FROM "Revision" WHERE name = ?', [TASKS]
+        )
+    )
+
+
+async def read_task_revision(connection: BaseDBAsyncClient, task_id: int) -> Optional[Revision]:
+    """Reads the version of one task.
+
+    :return: Version and time of the last write, or None if the task does not exist
+    :rtype: Optional[Revision]
+    """
+    return _revision(
+        await connection.execute_query_dict(
+            'SELECT version, modified FROM "TaskRevision" WHERE task_id = ?', [task_id]
+        )
+    )
+
+
+async def read_history_revision(connection: BaseDBAsyncClient) -> Optional[Tuple[int, int, datetime]]:
+    """Reads the first and last `History` ids and the time of the last row.
+
+    History rows are only appended, or removed from the start when archived,
+    so the two ids identify the table contents. Both lookups use the primary
+    key and do not depend on the table size.
+
+    :return: First id, last id and time of the last row, or None if empty
+    :rtype: Optional[Tuple[int, int, datetime]]
+    """
+    rows = await connection.execute_query_dict(
+        'SELECT (SELECT MIN(id) FROM "History") AS first, id AS last, time '
+        'FROM "History" ORDER BY id DESC LIMIT 1'
+    )
+    if not rows:
+        return None
+    time = rows[0]["time"]
+    if not isinstance(time, datetime):
+        time = datetime.fromisoformat(time)
+    return rows[0]["first"], rows[0]["last"], time
@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Optional
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+SEARCH_TABLE = "TasksActivitySearch"
+
+# Column weights of bm25(): a match in the task name counts the most.
+RANK = "bm25(10.0, 4.0, 1.0)"
+
+SEARCH_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS "{SEARCH_TABLE}" USING fts5(
+    TaskName, TaskDescription, Notes,
+    content="TasksActivity", content_rowid="TaskID",
+    tokenize="unicode61 remove_diacritics 2"
+);
+CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_insert" AFTER INSERT ON "TasksActivity" BEGIN
+    INSERT INTO "{SEARCH_TABLE}"(rowid, TaskName, TaskDescription, Notes)
+    VALUES (new.TaskID, new.TaskName, new.TaskDescription, new.Notes);
+END;
+CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_delete" AFTER DELETE ON "TasksActivity" BEGIN
+    INSERT INTO "{SEARCH_TABLE}"("{SEARCH_TABLE}", rowid, TaskName, TaskDescription, Notes)
+    VALUES ('delete', old.TaskID, old.TaskName, old.TaskDescription, old.Notes);
+END;
+CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_update"
+AFTER UPDATE OF TaskName, TaskDescription, Notes ON "TasksActivity" BEGIN
+    INSERT INTO "{SEARCH_TABLE}"("{SEARCH_TABLE}", rowid, TaskName, TaskDescription, Notes)
+    VALUES ('delete', old.TaskID, old.TaskName, old.TaskDescription, old.Notes);
+    INSERT INTO "{SEARCH_TABLE}"(rowid, TaskName, TaskDescription, Notes)
+    VALUES (new.TaskID, new.TaskName, new.TaskDescription, new.Notes);
+END;
+"""
+
+SEARCH_RANK = f"INSERT INTO \"{SEARCH_TABLE}\"(\"{SEARCH_TABLE}\", rank) VALUES ('rank', '{RANK}')"
+
+# Indexes the tasks of one id range, used to fill a new index in batches.
+FILL_SEARCH = (
+    f'INSERT INTO "{SEARCH_TABLE}"(rowid, TaskName, TaskDescription, Notes) '
+    'SELECT TaskID, TaskName, TaskDescription, Notes FROM "TasksActivity" '
+    "WHERE TaskID > ? AND TaskID <= ?"
+)
+
+
+async def rebuild_search_index(connection: BaseDBAsyncClient) -> None:
+    """Rebuilds the full-text index from the `TasksActivity` table.
+
+    :param connection: Writer connection
+    :return: None
+    """
+    await connection.execute_query(
+        f"INSERT INTO \"{SEARCH_TABLE}\"(\"{SEARCH_TABLE}\") VALUES ('rebuild')"
+    )
+
+
+def match_expression(text: str) -> str:
+    """Turns free text into an FTS5 query matching every word.
+
+    Words are quoted so punctuation is never read as query syntax, and a
+    trailing `*` is kept as a prefix match.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+async def search_tasks(
+    connection: BaseDBAsyncClient,
+    text: str,
+    limit: int,
+    after: Optional[tuple] = None,
+) -> List[Dict[str, Any]]:
+    """Searches tasks ranked by relevance.
+
+    :param connection: Connection to run the query on
+    :param text: Words to search for
+    :param limit: Maximum number of hits
+    :param after: (rank, task_id) of the last hit of the previous page
+    :return: Hits with `task_id`, `rank` and `snippet` keys, best first
+    :rtype: List[Dict[str, Any]]
+    """
+    expression = match_expression(text)
+    if not expression:
+        return []
+    query = f"""
+        SELECT * FROM (
+            SELECT rowid AS task_id, rank,
+                snippet("{SEARCH_TABLE}", -1, '<b>', '</b>', '…', 16) AS snippet
+            FROM "{SEARCH_TABLE}" WHERE "{SEARCH_TABLE}" MATCH ?
+        )
+    """
+    values: List[Any] = [expression]
+    if after is not None:
+        query += " WHERE (rank, task_id) > (?, ?)"
+        values.extend(after)
+    query += " ORDER BY rank, task_id LIMIT ?"
+    values.append(limit)
+    return await connection.execute_query_dict(query, values)
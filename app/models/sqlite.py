@@ -0,0 +1,123 @@
+import sqlite3
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.sqlite.client import (
+    SqliteClient,
+    TransactionWrapper,
+    translate_exceptions,
+)
+from tortoise.exceptions import TransactionManagementError
+
+from ..metrics import observe_query
+
+
+class InstrumentedQueries:
+    """Times every statement of a client and reports it to the metrics."""
+
+    read_only = False
+
+    @property
+    def _role(self) -> str:
+        return "reader" if self.read_only else "writer"
+
+    async def execute_insert(self, query: str, values: list) -> int:
+        started = time.perf_counter()
+        try:
+            return await super().execute_insert(query, values)  # type: ignore
+        finally:
+            observe_query(query, self._role, time.perf_counter() - started, 1)
+
+    async def execute_many(self, query: str, values: List[list]) -> None:
+        started = time.perf_counter()
+        try:
+            await super().execute_many(query, values)  # type: ignore
+        finally:
+            observe_query(query, self._role, time.perf_counter() - started, len(values))
+
+    async def execute_query(
+        self, query: str, values: Optional[list] = None
+    ) -> Tuple[int, Sequence[dict]]:
+        started = time.perf_counter()
+        rows = 0
+        try:
+            result = await super().execute_query(query, values)  # type: ignore
+            rows = result[0]
+            return result
+        finally:
+            observe_query(query, self._role, time.perf_counter() - started, rows)
+
+    async def execute_query_dict(self, query: str, values: Optional[list] = None) -> List[dict]:
+        started = time.perf_counter()
+        rows = 0
+        try:
+            result = await super().execute_query_dict(query, values)  # type: ignore
+            rows = len(result)
+            return result
+        finally:
+            observe_query(query, self._role, time.perf_counter() - started, rows)
+
+    async def execute_script(self, query: str) -> None:
+        started = time.perf_counter()
+        try:
+            await super().execute_script(query)  # type: ignore
+        finally:
+            observe_query(query, self._role, time.perf_counter() - started, 0)
+
+
+class TunedSqliteClient(InstrumentedQueries, SqliteClient):
+    """SQLite client used by the application's connections.
+
+    Writes take the database lock up front with `BEGIN IMMEDIATE`, so a
+    writer waits for `busy_timeout` instead of failing when another
+    connection or process holds the lock. Read-only connections are opened
+    with `query_only` and never take the write lock. Every statement is
+    timed for the metrics.
+    """
+
+    def __init__(self, file_path: str, read_only: bool = False, **kwargs: Any) -> None:
+        super().__init__(file_path, **kwargs)
+        self.read_only = read_only
+
+    async def create_connection(self, with_db: bool) -> None:
+        created = self._connection is None
+        await super().create_connection(with_db)
+        if created and self.read_only:
+            cursor = await self._connection.execute("PRAGMA query_only=ON")  # type: ignore
+            await cursor.close()
+
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContext(ImmediateTransactionWrapper(self))
+
+    @translate_exceptions
+    async def execute_many(self, query: str, values: List[list]) -> None:
+        async with self.acquire_connection() as connection:
+            self.log.debug("%s: %s", query, values)
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                await connection.executemany(query, values)
+            except Exception:
+                await connection.rollback()
+                raise
+            else:
+                await connection.commit()
+
+
+class ImmediateTransactionWrapper(InstrumentedQueries, TransactionWrapper):
+    async def start(self) -> None:
+        try:
+            await self._connection.commit()
+            await self._connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as exc:
+            raise TransactionManagementError(exc)
+
+    async def commit(self) -> None:
+        started = time.perf_counter()
+        try:
+            await super().commit()
+        finally:
+            observe_query("COMMIT", "writer", time.perf_counter() - started, 0)
+
+
+client_class = TunedSqliteClient
@@ -0,0 +1,188 @@
+import asyncio
+from enum import Enum
+from typing import Dict, List, Tuple, Type
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from .database import WRITER
+from .enum import GroupCategory, GroupName, StageName, Status, enum_codes
+from .revision import NOW
+
+# Counted task dimensions and the TasksActivity column each one reads.
+DIMENSIONS = {
+    "status": "Status",
+    "stage_name": "StageName",
+    "activity_group_name": "ActivityGroupName",
+    "core_group_category": "CoreGroupCategory",
+}
+
+# Enum of each dimension, to map stored codes back to their values.
+DIMENSION_ENUMS: Dict[str, Type[Enum]] = {
+    "status": Status,
+    "stage_name": StageName,
+    "activity_group_name": GroupName,
+    "core_group_category": GroupCategory,
+}
+
+TOTAL = "total"
+
+STATS = "stats"
+
+
+def _count(dimension: str, value: str, delta: int) -> str:
+    return (
+        f'INSERT INTO "TaskCounter"(dimension, value, count) VALUES (\'{dimension}\', {value}, {delta}) '
+        f"ON CONFLICT(dimension, value) DO UPDATE SET count = count + {delta};"
+    )
+
+
+def _counts(row: str, delta: int) -> str:
+    return "\n    ".join(
+        [_count(TOTAL, "''", delta)]
+        + [_count(dimension, f"{row}.{column}", delta) for dimension, column in DIMENSIONS.items()]
+    )
+
+
+STATS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS "TaskCounter" (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INT NOT NULL,
+    PRIMARY KEY (dimension, value)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS "HistoryDailyCounter" (
+    day TEXT NOT NULL,
+    action TEXT NOT NULL,
+    count INT NOT NULL,
+    PRIMARY KEY (day, action)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS "TaskCounter_insert" AFTER INSERT ON "TasksActivity" BEGIN
+    {_counts("new", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS "TaskCounter_delete" AFTER DELETE ON "TasksActivity" BEGIN
+    {_counts("old", -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS "TaskCounter_update"
+AFTER UPDATE OF {", ".join(DIMENSIONS.values())} ON "TasksActivity" BEGIN
+    {_counts("old", -1)}
+    {_counts("new", 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS "HistoryDailyCounter_insert" AFTER INSERT ON "History" BEGIN
+    INSERT INTO "HistoryDailyCounter"(day, action, count)
+    VALUES (substr(new.time, 1, 10), new.action, 1)
+    ON CONFLICT(day, action) DO UPDATE SET count = count + 1;
+END;
+"""
+
+RECOMPUTE_TASKS = ['DELETE FROM "TaskCounter"'] + [
+    f'INSERT INTO "TaskCounter"(dimension, value, count) '
+    f'SELECT \'{dimension}\', {column}, COUNT(*) FROM "TasksActivity" GROUP BY {column}'
+    for dimension, column in [(TOTAL, "''")] + list(DIMENSIONS.items())
+]
+
+FILL_HISTORY = (
+    'INSERT INTO "HistoryDailyCounter"(day, action, count) '
+    'SELECT substr(time, 1, 10) AS day, action, COUNT(*) FROM "History" GROUP BY day, action'
+)
+
+# Days before the oldest History row may have been archived, so only the
+# days still fully present in the hot table are recounted.
+RECOMPUTE_HISTORY = [
+    'DELETE FROM "HistoryDailyCounter" WHERE day > (SELECT substr(MIN(time), 1, 10) FROM "History")',
+    'INSERT INTO "HistoryDailyCounter"(day, action, count) '
+    'SELECT substr(time, 1, 10) AS day, action, COUNT(*) FROM "History" '
+    'WHERE day > (SELECT substr(MIN(time), 1, 10) FROM "History") GROUP BY day, action',
+]
+
+
+# Time of the last recount, kept in the Revision table next to the table versions.
+RECOMPUTED = (
+    f'INSERT INTO "Revision"(name, version, modified) VALUES (\'{STATS}\', 1, {NOW}) '
+    "ON CONFLICT(name) DO UPDATE SET version = version + 1, modified = excluded.modified"
+)
+
+
+async def read_task_counters(connection: BaseDBAsyncClient) -> Dict[str, Dict[str, int]]:
+    """Reads every non-empty task counter.
+
+    Counters follow the stored column values, so with `ENUM_STORAGE=code`
+    they are keyed by code. Codes are mapped back to their enum values,
+    merging both forms while a table is being converted.
+
+    :return: Counts by dimension, then by value
+    :rtype: Dict[str, Dict[str, int]]
+    """
+    decoded = {
+        dimension: {
+            stored: member.value
+            for member, code in enum_codes(enum_type).items()
+            for stored in (code, member.value)
+        }
+        for dimension, enum_type in DIMENSION_ENUMS.items()
+    }
+    counters: Dict[str, Dict[str, int]] = {}
+    for row in await connection.execute_query_dict(
+        'SELECT dimension, value, count FROM "TaskCounter" WHERE count != 0'
+    ):
+        value = decoded.get(row["dimension"], {}).get(row["value"], row["value"])
+        counts = counters.setdefault(row["dimension"], {})
+        counts[value] = counts.get(value, 0) + row["count"]
+    return {
+        dimension: {value: count for value, count in counts.items() if count}
+        for dimension, counts in counters.items()
+    }
+
+
+async def read_daily_counters(
+    connection: BaseDBAsyncClient, since: str
+) -> List[Tuple[str, str, int]]:
+    """Reads History counts per day and action from `since` on.
+
+    :param since: First day, as YYYY-MM-DD
+    :return: (day, action, count) rows ordered by day
+    :rtype: List[Tuple[str, str, int]]
+    """
+    return [
+        (row["day"], row["action"], row["count"])
+        for row in await connection.execute_query_dict(
+            'SELECT day, action, count FROM "HistoryDailyCounter" WHERE day >= ? ORDER BY day',
+            [since],
+        )
+    ]
+
+
+async def recompute_stats(connection: BaseDBAsyncClient) -> int:
+    """Recounts every counter from the base tables to correct drift.
+
+    :param connection: Writer transaction
+    :return: Number of task counters whose value changed
+    :rtype: int
+    """
+    before = await read_task_counters(connection)
+    for query in RECOMPUTE_TASKS + RECOMPUTE_HISTORY + [RECOMPUTED]:
+        await connection.execute_query(query)
+    after = await read_task_counters(connection)
+    return sum(
+        before.get(dimension, {}).get(value) != after.get(dimension, {}).get(value)
+        for dimension in set(before) | set(after)
+        for value in set(before.get(dimension, {})) | set(after.get(dimension, {}))
+    )
+
+
+async def recompute_periodically(interval: float) -> None:
+    """Recounts the counters every `interval` seconds.
+
+    Every server process runs this loop. The check and the recount share
+    one write transaction, so a process skips its turn when another one
+    recounted within the interval.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        async with in_transaction(WRITER) as connection:
+            recent = await connection.execute_query_dict(
+                f'SELECT 1 FROM "Revision" WHERE name = \'{STATS}\' '
+                f"AND modified > strftime('%Y-%m-%d %H:%M:%f+00:00', 'now', '-{interval * 0.9} seconds')"
+            )
+            if not recent:
+                await recompute_stats(connection)
@@ -0,0 +1,162 @@
+"""Helpers shared by the benchmarks: temporary database, seed data, statistics and baselines."""
+import json
+import os
+import platform
+import tempfile
+from datetime import date
+from typing import Any, Dict, List, Sequence
+
+# Metrics compared against a baseline, and whether lower values are better.
+COMPARED = {"p50_ms": True, "p95_ms": True, "throughput": False, "median_us": True}
+
+FORM = {
+    "task_name": "benchmark task",
+    "task_description": "description " * 20,
+    "activity_type_id": 1,
+    "activity_type_name": "tasks",
+    "activity_group_sub_category_id": 1,
+    "activity_group_sub_category_name": "customer contact",
+    "activity_group_id": 1,
+    "activity_group_name": "contact",
+    "stage_id": 1,
+    "stage_name": "new",
+    "core_group_category_id": 1,
+    "core_group_category": "leads",
+    "core_group_id": 1,
+    "core_group_name": "core group",
+    "due_date": "2024-01-01",
+    "action_type": "action",
+    "related_to": "related",
+    "related_to_picture_id": 1,
+    "related_to_email": "related@example.com",
+    "related_to_company": "company",
+    "assign_to": "assignee",
+    "assign_to_picture_id": 1,
+    "assign_to_email": "assignee@example.com",
+    "assign_to_company": "company",
+    "notes": "notes " * 20,
+    "status": "in progress",
+    "attachment_id": 1,
+    "attachments": 1,
+    "link_response_id": 1,
+    "link_object_id": 1,
+    "created_by": "benchmark",
+}
+
+
+def use_temporary_database() -> None:
+    """Moves to a new temporary directory and points `DB_URL` at a database in it.
+
+    Must run before the application is imported, since settings are read at
+    import time.
+    """
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("DB_URL", "sqlite://benchmark.sqlite3")
+
+
+def task_fields(i: int) -> Dict[str, Any]:
+    """Field values of the `i`-th seeded task, as accepted by `TasksActivity`."""
+    fields = dict(FORM, task_name=f"task {i}", due_date=date(2024, 1, 1 + i % 28))
+    fields["attachments"] = str(fields["attachments"])
+    return fields
+
+
+async def seed(tasks: int, histories: int = 0) -> None:
+    """Creates the schema and inserts `tasks` tasks and `histories` History rows.
+
+    Connections are closed afterwards, so the application can open its own.
+    """
+    from tortoise import Tortoise
+
+    from app.models.db_task import History, InitializeDB, TasksActivity
+    from app.models.enum import HistoryActionType
+
+    await InitializeDB()
+    await TasksActivity.bulk_create(
+        [TasksActivity(**task_fields(i)) for i in range(tasks)], batch_size=1000
+    )
+    await History.bulk_create(
+        [
+            History(
+                task_id=i % max(tasks, 1) + 1,
+                action=HistoryActionType.UPDATE,
+                description=f"Task {i % max(tasks, 1) + 1} was updated",
+            )
+            for i in range(histories)
+        ],
+        batch_size=1000,
+    )
+    await Tortoise.close_connections()
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted `values`, 0 if there are none."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Throughput and latency percentiles, in milliseconds, of one scenario."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def report(suite: str, parameters: Dict[str, Any], results: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    return {
+        "suite": suite,
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lists the metrics of `current` that are worse than `baseline` by more than `tolerance`.
+
+    :param tolerance: Allowed relative change, 0.2 allows 20% slower
+    :return: One message per regression
+    :rtype: List[str]
+    """
+    regressions = []
+    for name, metrics in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for metric, lower_is_better in COMPARED.items():
+            if metric not in metrics or not previous.get(metric):
+                continue
+            change = metrics[metric] / previous[metric] - 1
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(
+                    f"{name} {metric}: {previous[metric]} -> {metrics[metric]} ({change:+.0%})"
+                )
+    return regressions
+
+
+def finish(result: Dict[str, Any], output: str, baseline: str, tolerance: float) -> int:
+    """Prints and stores `result`, then checks it against `baseline`.
+
+    :return: Exit status, 1 if a regression was found
+    :rtype: int
+    """
+    for name, metrics in result["results"].items():
+        print(f"{name}: " + ", ".join(f"{key} {value}" for key, value in metrics.items()))
+    if output:
+        with open(output, "w") as file:
+            json.dump(result, file, indent=2)
+    if not baseline:
+        return 0
+    with open(baseline) as file:
+        regressions = compare(result, json.load(file), tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
@@ -0,0 +1,150 @@
+"""Compares the text and code storage of the TasksActivity enum columns.
+
+Seeds a text database, copies it and converts the copy with the same
+batched conversion `python -m app migrate` runs for `ENUM_STORAGE=code`.
+Reports the size of the table and its indexes, and the time of a full
+table scan and of an index scan, for both.
+
+Usage::
+
+    python -m benchmarks.enum_storage --tasks 100000 --repeat 7 --output enum.json
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import finish, report, use_temporary_database
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--tasks", type=int, default=100000, help="seeded tasks")
+parser.add_argument("--repeat", type=int, default=7, help="timed runs per scan")
+parser.add_argument("--output", default="", help="write results as JSON to this file")
+parser.add_argument("--baseline", default="", help="compare against results stored earlier")
+parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+
+# Full scan of an unindexed enum column, and a scan of the (Status, DueDate) index.
+SCANS = {
+    "table_scan": "SELECT COUNT(*) FROM \"TasksActivity\" WHERE ActivityGroupName IN (?, ?)",
+    "index_scan": "SELECT Status, COUNT(*) FROM \"TasksActivity\" GROUP BY Status",
+}
+
+
+def diversify(path: str) -> None:
+    """Spreads the seeded tasks over every member of the enums."""
+    from app.models.enum import ActivityName, GroupName, StageName, Status
+
+    connection = sqlite3.connect(path)
+    for column, enum_type in [
+        ("Status", Status),
+        ("StageName", StageName),
+        ("ActivityGroupName", GroupName),
+        ("ActivityTypeName", ActivityName),
+    ]:
+        values = [str(member.value) for member in enum_type]
+        cases = " ".join(f"WHEN {i} THEN '{value}'" for i, value in enumerate(values))
+        connection.execute(
+            f'UPDATE "TasksActivity" SET "{column}" = CASE TaskID % {len(values)} {cases} END'
+        )
+    connection.commit()
+    connection.close()
+
+
+def space(path: str) -> Dict[str, float]:
+    """Size in KiB of the file and, with the dbstat table, of TasksActivity and its indexes."""
+    connection = sqlite3.connect(path)
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    sizes = {
+        "file_kb": round(connection.execute("PRAGMA page_count").fetchone()[0] * page_size / 1024, 1)
+    }
+    try:
+        rows = connection.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name = 'TasksActivity' "
+            "OR name LIKE 'idx_TasksActivi_%' GROUP BY name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    if rows:
+        sizes["table_kb"] = round(sum(size for name, size in rows if name == "TasksActivity") / 1024, 1)
+        sizes["indexes_kb"] = round(sum(size for name, size in rows if name != "TasksActivity") / 1024, 1)
+    connection.close()
+    return sizes
+
+
+def measure(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    run()
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {"median_us": round(timings[len(timings) // 2] * 1e6, 1)}
+
+
+def scans(path: str, arguments: Dict[str, list], repeat: int) -> Dict[str, Dict[str, float]]:
+    connection = sqlite3.connect(path)
+    results = {
+        name: measure(lambda: connection.execute(query, arguments[name]).fetchall(), repeat)
+        for name, query in SCANS.items()
+    }
+    connection.close()
+    return results
+
+
+def main(args: argparse.Namespace) -> Dict[str, Any]:
+    use_temporary_database()
+    # The seed is written as text and converted afterwards.
+    os.environ["ENUM_STORAGE"] = "text"
+    from app.models.enum import GroupName, enum_codes
+    from app.models.migrations import connect, convert_enum_storage
+    from benchmarks.common import seed
+
+    asyncio.run(seed(args.tasks))
+    diversify("benchmark.sqlite3")
+    shutil.copy("benchmark.sqlite3", "coded.sqlite3")
+
+    connection = connect("coded.sqlite3")
+    started = time.perf_counter()
+    convert_enum_storage(connection, "code", print)
+    conversion = time.perf_counter() - started
+    connection.close()
+    for path in ("benchmark.sqlite3", "coded.sqlite3"):
+        sqlite3.connect(path, isolation_level=None).execute("VACUUM")
+
+    groups = [GroupName.CONTACT, GroupName.QUOTES]
+    arguments = {
+        "text": {"table_scan": [str(g.value) for g in groups], "index_scan": []},
+        "code": {"table_scan": [enum_codes(GroupName)[g] for g in groups], "index_scan": []},
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for storage, path in (("text", "benchmark.sqlite3"), ("code", "coded.sqlite3")):
+        results[f"enum_storage.{storage}.space"] = space(path)
+        for name, metrics in scans(path, arguments[storage], args.repeat).items():
+            results[f"enum_storage.{storage}.{name}"] = metrics
+    text, code = results["enum_storage.text.space"], results["enum_storage.code.space"]
+    results["enum_storage.saving"] = {
+        **{
+            key.replace("_kb", "_percent"): round((1 - code[key] / text[key]) * 100, 1)
+            for key in text
+            if text[key]
+        },
+        **{
+            f"{name}_speedup": round(
+                results[f"enum_storage.text.{name}"]["median_us"]
+                / results[f"enum_storage.code.{name}"]["median_us"],
+                2,
+            )
+            for name in SCANS
+        },
+        "conversion_s": round(conversion, 2),
+    }
+    return report("enum_storage", {"tasks": args.tasks, "repeat": args.repeat}, results)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    raise SystemExit(finish(main(args), args.output, args.baseline, args.tolerance))
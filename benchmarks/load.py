@@ -0,0 +1,113 @@
+"""Drives every endpoint of the application in-process and reports latency.
+
+The application runs on a temporary SQLite database seeded with `--tasks`
+tasks and `--histories` History rows, and is called through an ASGI
+transport, so results measure the application and database, not the
+network.
+
+Usage::
+
+    python -m benchmarks.load --requests 500 --concurrency 16 --output load.json
+    python -m benchmarks.load --baseline load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.common import FORM, finish, report, seed, summarize, use_temporary_database
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--tasks", type=int, default=2000, help="seeded tasks")
+parser.add_argument("--histories", type=int, default=10000, help="seeded History rows")
+parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+parser.add_argument("--page", type=int, default=50, help="page size of the list scenarios")
+parser.add_argument("--seed", type=int, default=0, help="random seed of the request mix")
+parser.add_argument("--output", default="", help="write results as JSON to this file")
+parser.add_argument("--baseline", default="", help="compare against results stored earlier")
+parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+
+Request = Callable[[Any, int], Awaitable[Any]]
+
+READS = {"get_task", "list_tasks", "list_histories"}
+
+
+def scenarios(args: argparse.Namespace) -> Dict[str, Request]:
+    """Requests of every scenario; each receives the client and the request number."""
+    rng = random.Random(args.seed)
+    task_ids = [rng.randint(1, args.tasks) for _ in range(args.requests)]
+    # Deleted tasks come from the end of the seeded range, and are not
+    # touched by the other scenarios that run before the delete scenario.
+    doomed = list(range(args.tasks, max(args.tasks - args.requests, 0), -1))
+    page = {"limit": args.page, "from_end": True}
+    return {
+        "create": lambda client, i: client.post("/tasks-activity", data=FORM),
+        "get_task": lambda client, i: client.get(f"/task/{task_ids[i]}"),
+        "list_tasks": lambda client, i: client.get("/task-activity", params=page),
+        "list_histories": lambda client, i: client.get("/histories", params=page),
+        "update": lambda client, i: client.put(
+            "/task-activity", data=dict(FORM, task_id=task_ids[i], notes=f"update {i}")
+        ),
+        "webhook": lambda client, i: client.post(
+            "/webhook", json={"task_id": task_ids[i], "notes": f"webhook {i}"}
+        ),
+        "delete": lambda client, i: client.request(
+            "DELETE", "/task-activity", data={"task_id": doomed[i % len(doomed)]}
+        ),
+    }
+
+
+async def run_scenario(client: Any, request: Request, requests: int, concurrency: int) -> Dict[str, float]:
+    """Sends `requests` requests with at most `concurrency` in flight."""
+    latencies: List[float] = []
+    errors = 0
+    numbers = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in numbers:
+            start = time.perf_counter()
+            response = await request(client, i)
+            latencies.append(time.perf_counter() - start)
+            body = response.json()
+            if response.status_code >= 400 or isinstance(body, dict) and not body.get("success", True):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    await seed(args.tasks, args.histories)
+    from app import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, request in scenarios(args).items():
+                if name in READS:
+                    # One untimed request warms up caches and prepared statements.
+                    await request(client, 0)
+                results[f"load.{name}"] = await run_scenario(
+                    client, request, args.requests, args.concurrency
+                )
+    parameters = {
+        key: getattr(args, key)
+        for key in ("tasks", "histories", "requests", "concurrency", "page", "seed")
+    }
+    return report("load", parameters, results)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else ""
+    baseline = os.path.abspath(args.baseline) if args.baseline else ""
+    use_temporary_database()
+    raise SystemExit(finish(asyncio.run(main(args)), output, baseline, args.tolerance))
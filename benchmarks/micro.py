@@ -0,0 +1,86 @@
+"""Micro-benchmarks of the per-request hot paths.
+
+Measures `TasksActivity.to_model()`, parsing of the urlencoded form sent
+to `/tasks-activity`, and validation of webhook payloads into
+`TasksActivityBody`.
+
+Usage::
+
+    python -m benchmarks.micro --number 2000 --repeat 7 --output micro.json
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, Dict, List
+from urllib.parse import urlencode
+
+from benchmarks.common import FORM, finish, report, task_fields
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--number", type=int, default=2000, help="calls per timed run")
+parser.add_argument("--repeat", type=int, default=7, help="timed runs per benchmark")
+parser.add_argument("--output", default="", help="write results as JSON to this file")
+parser.add_argument("--baseline", default="", help="compare against results stored earlier")
+parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+
+
+def measure(run: Callable[[], Any], number: int, repeat: int) -> Dict[str, float]:
+    """Times `number` calls of `run`, `repeat` times, and reports the median run."""
+    run()
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append((time.perf_counter() - start) / number)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    return {
+        "median_us": round(median * 1e6, 3),
+        "best_us": round(timings[0] * 1e6, 3),
+        "ops_per_sec": round(1 / median, 1),
+    }
+
+
+def form_parser(body: bytes) -> Callable[[], Any]:
+    """Parses `body` the way FastAPI reads `Form()` parameters."""
+    from starlette.requests import Request
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", b"application/x-www-form-urlencoded")],
+    }
+
+    async def parse() -> Any:
+        async def receive() -> Dict[str, Any]:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return await Request(scope, receive).form()
+
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(parse())
+
+
+def main(args: argparse.Namespace) -> Dict[str, Any]:
+    from datetime import datetime, timezone
+
+    from app.api.body import TasksActivityBody
+    from app.models.db_task import TasksActivity
+
+    task = TasksActivity(**task_fields(1), task_id=1, created_on=datetime.now(timezone.utc))
+    payload = {"task_id": 1, "notes": "updated", "status": "completed", "due_date": "2024-02-01"}
+    benchmarks = {
+        "micro.to_model": task.to_model,
+        "micro.form_parsing": form_parser(urlencode(FORM).encode()),
+        "micro.body_validation": lambda: TasksActivityBody.model_validate(payload),
+    }
+    results = {
+        name: measure(run, args.number, args.repeat) for name, run in benchmarks.items()
+    }
+    return report("micro", {"number": args.number, "repeat": args.repeat}, results)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    raise SystemExit(finish(main(args), args.output, args.baseline, args.tolerance))
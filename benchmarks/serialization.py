@@ -0,0 +1,70 @@
+"""Compares the ORM and the raw-row serialization of list pages.
+
+Usage::
+
+    python -m benchmarks.serialization --rows 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from benchmarks.common import task_fields, use_temporary_database
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+parser.add_argument("--repeat", type=int, default=20, help="timed runs per path")
+
+
+async def timed(repeat: int, run: Callable[[], Awaitable[bytes]]) -> List[float]:
+    await run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main(rows: int, repeat: int) -> None:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from tortoise import Tortoise
+
+    from app.api.serialization import TASK_COLUMNS, FastJSONResponse, fetch_records
+    from app.models.database import tortoise_config
+    from app.models.db_task import InitializeDB, TasksActivity
+    from app.models.task import TasksActivityModel
+
+    await InitializeDB()
+    await Tortoise.close_connections()
+    await Tortoise.init(config=tortoise_config())
+    await TasksActivity.bulk_create([TasksActivity(**task_fields(i)) for i in range(rows)])
+    adapter = TypeAdapter(List[TasksActivityModel])
+
+    async def orm() -> bytes:
+        # What FastAPI does for response_model=List[TasksActivityModel].
+        models = [task.to_model() for task in await TasksActivity.all().limit(rows)]
+        validated = adapter.validate_python(jsonable_encoder(models))
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    async def raw() -> bytes:
+        records = await fetch_records(TasksActivity.all().limit(rows), TASK_COLUMNS)
+        return FastJSONResponse(records).body
+
+    if adapter.validate_json(await orm()) != adapter.validate_json(await raw()):
+        raise SystemExit("serialization paths produced different documents")
+    for name, run in (("orm", orm), ("raw", raw)):
+        timings = sorted(await timed(repeat, run))
+        print(
+            f"{name}: median {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"best {timings[0] * 1000:.2f} ms for {rows} rows"
+        )
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    use_temporary_database()
+    asyncio.run(main(args.rows, args.repeat))